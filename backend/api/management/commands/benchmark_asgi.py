@@ -0,0 +1,104 @@
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from foodgram.benchmark import benchmark_database, serve
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+PATHS = ('/api/recipes/?limit=6', '/api/recipes/{recipe_id}/',
+         '/api/tags/', '/api/ingredients/?name=ingredient')
+
+UVICORN = 'uvicorn.workers.UvicornWorker'
+
+MODES = (
+    ('WSGI', 'foodgram.wsgi:application', None),
+    ('ASGI', 'foodgram.asgi:application', UVICORN),
+)
+
+
+class Command(BaseCommand):
+    help = ('Compare read throughput of WSGI and ASGI servers '
+            'on a synthetic catalog')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=4000)
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=[8, 32])
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8766)
+
+    def seed(self, recipes=200, users=20):
+        authors = User.objects.bulk_create(
+            User(username=f'user{number}', email=f'user{number}@example.com',
+                 first_name='Имя', last_name='Фамилия')
+            for number in range(users)
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'tag{number}', color='#E26C2D', slug=f'tag{number}')
+            for number in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient{number}', measurement_unit='г')
+            for number in range(50)
+        )
+        created = Recipe.objects.bulk_create(
+            Recipe(author=authors[number % users], name=f'recipe{number}',
+                   image='x.jpg', text='-', cooking_time=5)
+            for number in range(recipes)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for number, recipe in enumerate(created)
+            for tag in tags[:1 + number % 3]
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=recipe.id,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=10 + shift
+            )
+            for number, recipe in enumerate(created)
+            for shift in range(8)
+        )
+        return Token.objects.create(user=authors[0]).key, created[4].id
+
+    def run_load(self, urls, token, requests, concurrency):
+        def get(number):
+            request = urllib.request.Request(
+                urls[number % len(urls)],
+                headers={'Authorization': f'Token {token}'}
+            )
+            started = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(get, range(200)))
+            started = time.perf_counter()
+            times = sorted(executor.map(get, range(requests)))
+            elapsed = time.perf_counter() - started
+        return (requests / elapsed, times[len(times) // 2],
+                times[int(len(times) * 0.99)])
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            token, recipe_id = self.seed()
+            paths = [path.format(recipe_id=recipe_id) for path in PATHS]
+            for name, application, worker_class in MODES:
+                with serve(application, options['port'], options['workers'],
+                           worker_class) as url:
+                    for concurrency in options['concurrency']:
+                        rps, p50, p99 = self.run_load(
+                            [url + path for path in paths], token,
+                            options['requests'], concurrency
+                        )
+                        self.stdout.write(
+                            f'{name} c={concurrency}: {rps:.0f} req/s, '
+                            f'p50 {p50:.0f} ms, p99 {p99:.0f} ms'
+                        )
@@ -0,0 +1,46 @@
+import time
+import urllib.request
+
+from django.core.management import BaseCommand
+from foodgram.benchmark import benchmark_database, serve
+from recipes.models import Tag
+
+
+class Command(BaseCommand):
+    help = ('Compare request latency with a new DB connection per request '
+            'and with persistent connections (DB_CONN_MAX_AGE)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=3000)
+        parser.add_argument('--conn-max-age', nargs='+',
+                            default=['0', '60'])
+        parser.add_argument('--path', default='/api/tags/')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def measure_latency(self, url, requests):
+        for _ in range(100):
+            urllib.request.urlopen(url).read()
+        times = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            urllib.request.urlopen(url).read()
+            times.append((time.perf_counter() - started) * 1000)
+        times.sort()
+        return times[len(times) // 2], times[int(len(times) * 0.99)]
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            Tag.objects.bulk_create(
+                Tag(name=f'tag{number}', color='#E26C2D', slug=f'tag{number}')
+                for number in range(3)
+            )
+            for age in options['conn_max_age']:
+                with serve('foodgram.wsgi:application', options['port'],
+                           options['workers'], DB_CONN_MAX_AGE=age) as url:
+                    p50, p99 = self.measure_latency(url + options['path'],
+                                                    options['requests'])
+                self.stdout.write(
+                    f'DB_CONN_MAX_AGE={age}: p50 {p50:.2f} ms, '
+                    f'p99 {p99:.2f} ms'
+                )
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management import BaseCommand
+from django.test.utils import override_settings
+from foodgram.benchmark import benchmark_database, measure
+from recipes.ingredient_index import IngredientIndex, ingredient_index
+from recipes.models import Ingredient
+from rest_framework.test import APIClient
+
+QUERIES = ('', 'м', 'мо', 'мол', 'молоко', 'сыр', 'соус')
+
+
+def search(client, name):
+    response = client.get('/api/ingredients/', {'name': name})
+    return len(response.data)
+
+
+class Command(BaseCommand):
+    help = ('Compare ingredient autocomplete latency with the in-memory '
+            'index and with the database filter on the full catalog')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with benchmark_database():
+            with open('./data/ingredients.json', encoding='utf-8') as file:
+                Ingredient.objects.bulk_create(
+                    Ingredient(**data) for data in json.load(file)
+                )
+            ingredient_index.invalidate()
+            build_ms, _ = measure(IngredientIndex().snapshot)
+            self.stdout.write(
+                f'{Ingredient.objects.count()} ингредиентов, '
+                f'построение справочника {build_ms:.1f} ms'
+            )
+            client = APIClient()
+            for name in QUERIES:
+                index_ms, found = measure(search, client, name,
+                                          repeat=repeat)
+                with override_settings(INGREDIENT_INDEX=False):
+                    query_ms, _ = measure(search, client, name,
+                                          repeat=repeat)
+                self.stdout.write(
+                    f'{name!r}: найдено {found}, справочник '
+                    f'{index_ms:.2f} ms, БД {query_ms:.2f} ms'
+                )
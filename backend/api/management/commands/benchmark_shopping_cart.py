@@ -0,0 +1,84 @@
+import json
+import random
+
+from api.v1.renderers import SHOPPING_CART_RENDERERS
+from api.v1.shopping_cart import get_shopping_cart_totals
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from foodgram.benchmark import benchmark_database, measure
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, ShoppingCart
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+def download(client, file_format):
+    response = client.get('/api/recipes/download_shopping_cart/',
+                          {'format': file_format})
+    return len(b''.join(response.streaming_content))
+
+
+def render(renderer, rows):
+    return sum(
+        len(chunk) for chunk in renderer.stream(rows)
+    )
+
+
+class Command(BaseCommand):
+    help = ('Compare shopping list renderers on a synthetic cart '
+            'in a test database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, recipes, per_recipe):
+        user = User.objects.create(username='buyer',
+                                   email='buyer@example.com')
+        with open('./data/ingredients.json', encoding='utf-8') as file:
+            ingredients = Ingredient.objects.bulk_create(
+                Ingredient(**data) for data in json.load(file)
+            )
+        created = Recipe.objects.bulk_create(
+            Recipe(author=user, name=f'recipe{number}', image='x.jpg',
+                   text='-', cooking_time=5)
+            for number in range(recipes)
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                               amount=random.randint(1, 500))
+            for recipe in created
+            for ingredient in random.sample(ingredients, per_recipe)
+        )
+        # по одному, чтобы сигналы обновили итоги списка покупок
+        for recipe in created:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        return user
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        repeat = options['repeat']
+        with benchmark_database():
+            user = self.seed(options['recipes'],
+                             options['ingredients_per_recipe'])
+            query_ms, rows = measure(
+                lambda: list(get_shopping_cart_totals(user)), repeat=repeat
+            )
+            self.stdout.write(
+                f'{options["recipes"]} рецептов, {len(rows)} строк, '
+                f'агрегация {query_ms:.1f} ms'
+            )
+            client = APIClient()
+            client.force_authenticate(user)
+            for renderer_class in SHOPPING_CART_RENDERERS:
+                file_format = renderer_class.format
+                request_ms, size = measure(download, client, file_format,
+                                           repeat=repeat)
+                render_ms, _ = measure(render, renderer_class(), rows,
+                                       repeat=repeat)
+                self.stdout.write(
+                    f'{file_format}: запрос {request_ms:.1f} ms, '
+                    f'запись {render_ms:.1f} ms, {size} байт'
+                )
@@ -0,0 +1,58 @@
+from api.v1.shopping_cart import (compute_shopping_cart_totals,
+                                  rebuild_shopping_cart_totals)
+from django.core.management import BaseCommand, CommandError
+from recipes.models import ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify precomputed shopping cart totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare stored totals with the recomputed ones'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Limit to the given user id (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if not options['verify']:
+            count = rebuild_shopping_cart_totals(users)
+            self.stdout.write(self.style.SUCCESS(
+                f'==>>>Итоги списков покупок пересчитаны: {count}<<<=='
+            ))
+            return
+        stored = ShoppingCartTotal.objects.all()
+        if users is not None:
+            stored = stored.filter(user_id__in=users)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in stored.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+        expected = compute_shopping_cart_totals(users)
+        mismatched = {
+            key for key in stored.keys() | expected.keys()
+            if stored.get(key) != expected.get(key)
+        }
+        for user_id, ingredient_id in sorted(mismatched):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'stored={stored.get((user_id, ingredient_id))} '
+                f'expected={expected.get((user_id, ingredient_id))}'
+            )
+        if mismatched:
+            raise CommandError(
+                f'Расхождений в итогах списков покупок: {len(mismatched)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            '==>>>Итоги списков покупок совпадают<<<=='
+        ))
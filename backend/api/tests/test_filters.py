@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.models import Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipeTagFilterTest(TestCase):
+    """
+    ?tags= отбирает рецепты с любым из тегов, а с tags_match=all -
+    со всеми тегами сразу
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author',
+                                          email='author@example.com')
+        cls.breakfast, cls.lunch, cls.dinner = Tag.objects.bulk_create(
+            Tag(name=slug, color=color, slug=slug)
+            for slug, color in (('breakfast', '#E26C2D'),
+                                ('lunch', '#49B64E'),
+                                ('dinner', '#8775D2'))
+        )
+        cls.recipes = {}
+        for name, tags in (('porridge', [cls.breakfast]),
+                           ('soup', [cls.lunch, cls.dinner]),
+                           ('omelette', [cls.breakfast, cls.lunch]),
+                           ('water', [])):
+            recipe = Recipe.objects.create(author=author, name=name,
+                                           image='recipes/x.jpg', text='-',
+                                           cooking_time=5)
+            recipe.tags.set(tags)
+            cls.recipes[name] = recipe.id
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def names(self, query):
+        response = self.client.get(f'/api/recipes/?limit=10&{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        return {name for name, pk in self.recipes.items() if pk in ids}
+
+    def test_any_tag(self):
+        self.assertEqual(self.names('tags=breakfast&tags=dinner'),
+                         {'porridge', 'soup', 'omelette'})
+        self.assertEqual(self.names('tags=lunch&tags_match=any'),
+                         {'soup', 'omelette'})
+
+    def test_all_tags(self):
+        self.assertEqual(
+            self.names('tags=breakfast&tags=lunch&tags_match=all'),
+            {'omelette'}
+        )
+        self.assertEqual(
+            self.names('tags=breakfast&tags=dinner&tags_match=all'), set()
+        )
+
+    def test_unknown_tag_is_rejected(self):
+        response = self.client.get('/api/recipes/?tags=supper')
+        self.assertEqual(response.status_code, 400)
+
+    def test_new_tag_is_picked_up(self):
+        self.assertEqual(self.names('tags=lunch'), {'soup', 'omelette'})
+        with self.captureOnCommitCallbacks(execute=True):
+            snack = Tag.objects.create(name='snack', color='#000000',
+                                       slug='snack')
+        Recipe.objects.get(name='water').tags.add(snack)
+        self.assertEqual(self.names('tags=snack&tags=dinner'),
+                         {'soup', 'water'})
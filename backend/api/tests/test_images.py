@@ -0,0 +1,40 @@
+import base64
+import os
+from io import BytesIO
+
+from api.v1.recipes_serializers import Base64ImageField
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+
+class Base64ImageFieldTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        buffer = BytesIO()
+        Image.frombytes('RGB', (240, 240), os.urandom(240 * 240 * 3)).save(
+            buffer, format='PNG'
+        )
+        cls.png = buffer.getvalue()
+
+    def decode(self, encoded):
+        field = Base64ImageField()
+        return field.to_internal_value(f'data:image/png;base64,{encoded}')
+
+    def test_image_larger_than_chunk(self):
+        self.assertGreater(len(self.png), Base64ImageField.chunk_size)
+        image = self.decode(base64.b64encode(self.png).decode())
+        self.assertEqual(image.read(), self.png)
+
+    def test_line_wrapped_image_larger_than_chunk(self):
+        encoded = base64.encodebytes(self.png).decode()
+        self.assertGreater(len(encoded), 3 * Base64ImageField.chunk_size)
+        self.assertEqual(self.decode(encoded).read(), self.png)
+        crlf = encoded.replace('\n', '\r\n')
+        self.assertEqual(self.decode(crlf).read(), self.png)
+
+    def test_truncated_base64(self):
+        with self.assertRaises(ValidationError):
+            self.decode(base64.b64encode(self.png).decode()[:-1])
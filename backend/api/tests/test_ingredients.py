@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Tag
+from recipes.versions import get_version
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+QUERIES = ('f', 'flo', 'ILK', 'salt', 'ca&measurement_unit=g')
+
+
+class IngredientSearchTest(TestCase):
+    """
+    Поиск в БД, пока справочник выключен или строится, отдаёт то же,
+    что и справочник в памяти
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # LOWER в SQLite меняет регистр только у латиницы
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('flour', 'g'), ('Flour rye', 'g'), ('milk', 'ml'),
+                ('salt', 'g'), ('dry milk', 'g'), ('carrot', 'g'),
+                ('cabbage', 'kg'), ('Rice flour', 'g'), ('fennel', 'g'),
+            )
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        ingredient_index.invalidate()
+
+    def search(self, query):
+        response = self.client.get(f'/api/ingredients/?name={query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_disabled_index_matches_index(self):
+        expected = {query: self.search(query) for query in QUERIES}
+        self.assertEqual(
+            [row['name'] for row in expected['flo']],
+            ['flour', 'Flour rye', 'Rice flour']
+        )
+        with override_settings(INGREDIENT_INDEX=False):
+            with self.assertNumQueries(len(QUERIES)):
+                found = {query: self.search(query) for query in QUERIES}
+        self.assertEqual(found, expected)
+
+    def test_warming_index_falls_back_to_database(self):
+        expected = self.search('mil')
+        ingredient_index.invalidate()
+        with ingredient_index._lock:
+            with self.assertNumQueries(1):
+                self.assertEqual(self.search('mil'), expected)
+            ingredient = Ingredient.objects.get(name='salt')
+            response = self.client.get(f'/api/ingredients/{ingredient.id}/')
+            self.assertEqual(response.json()['name'], 'salt')
+
+    def test_version_read_once_per_request(self):
+        author = User.objects.create_user(username='author',
+                                          email='author@example.com')
+        client = APIClient()
+        client.force_authenticate(author)
+        tag = Tag.objects.create(name='tag', color='#E26C2D', slug='tag')
+        ingredient_index.snapshot()
+        with mock.patch('recipes.ingredient_index.get_version',
+                        wraps=get_version) as version:
+            response = client.post('/api/recipes/', {
+                'name': 'pancakes', 'text': '-', 'cooking_time': 5,
+                'tags': [tag.id], 'image': None,
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 10}
+                    for ingredient in Ingredient.objects.all()
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(version.call_count, 1)
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipePaginationTest(TestCase):
+    """
+    Лента листается курсором и страницами в каждом режиме подсчёта
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author',
+                                          email='author@example.com')
+        recipes = [
+            Recipe.objects.create(author=author, name=f'recipe{number}',
+                                  image='recipes/x.jpg', text='-',
+                                  cooking_time=5)
+            for number in range(7)
+        ]
+        # у пяти рецептов одинаковое время публикации
+        now = timezone.now()
+        for number, recipe in enumerate(recipes):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(days=max(number - 4, 0))
+            )
+        cls.feed = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def ids(self, data):
+        return [recipe['id'] for recipe in data['results']]
+
+    def test_cursor_walks_ties_without_gaps(self):
+        data = self.get('/api/recipes/?limit=2&cursor=')
+        self.assertIsNone(data['count'])
+        self.assertIsNone(data['previous'])
+        found = self.ids(data)
+        while data['next']:
+            data = self.get(data['next'])
+            found += self.ids(data)
+        self.assertEqual(found, self.feed)
+
+    def test_count_modes(self):
+        for mode, count in (('exact', 7), ('estimated', 7), ('none', None)):
+            with self.subTest(mode=mode):
+                data = self.get(f'/api/recipes/?limit=3&page=2&count={mode}')
+                self.assertEqual(data['count'], count)
+                self.assertEqual(self.ids(data), self.feed[3:6])
+                self.assertIsNotNone(data['next'])
+                self.assertIsNotNone(data['previous'])
+                data = self.get(f'/api/recipes/?limit=3&page=3&count={mode}')
+                self.assertEqual(self.ids(data), self.feed[6:])
+                self.assertIsNone(data['next'])
+
+    def test_invalid_page_is_not_found_in_every_mode(self):
+        for mode in ('exact', 'estimated', 'none'):
+            for page in ('abc', '0', '4'):
+                with self.subTest(mode=mode, page=page):
+                    response = self.client.get(
+                        f'/api/recipes/?limit=3&page={page}&count={mode}'
+                    )
+                    self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/recipes/?cursor=abc')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from foodgram.caches import state_cache
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag)
+from rest_framework.test import APIClient
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class QueryCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(username='viewer',
+                                              email='viewer@example.com')
+        authors = [
+            User.objects.create_user(username=f'author{number}',
+                                     email=f'author{number}@example.com')
+            for number in range(4)
+        ]
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'tag{number}', color=f'#00000{number}',
+                slug=f'tag{number}')
+            for number in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient{number}', measurement_unit='г')
+            for number in range(10)
+        )
+        recipes = [
+            Recipe.objects.create(author=authors[number % 4],
+                                  name=f'recipe{number}',
+                                  image='recipes/x.jpg', text='-',
+                                  cooking_time=5)
+            for number in range(16)
+        ]
+        for number, recipe in enumerate(recipes):
+            recipe.tags.set(tags[:1 + number % 3])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe,
+                               ingredient=ingredients[(number + shift) % 10],
+                               amount=10)
+            for number, recipe in enumerate(recipes)
+            for shift in range(3)
+        )
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=cls.viewer, recipe=recipe)
+            for recipe in recipes[::2]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.viewer, recipe=recipe)
+            for recipe in recipes[::3]
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.viewer, author=author)
+            for author in authors
+        )
+
+    def setUp(self):
+        cache.clear()
+        state_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def assert_page(self, url, queries, results):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), results)
+        return response
+
+    def test_recipe_page(self):
+        """
+        Флаги избранного, покупок и подписок загружаются запросом на связь
+        для всей страницы, а не на каждый рецепт
+        """
+        response = self.assert_page('/api/recipes/?limit=6', 5, 6)
+        self.assertTrue(any(recipe['is_favorited']
+                            for recipe in response.data['results']))
+        cache.clear()
+        self.assert_page('/api/recipes/?limit=12', 5, 12)
+
+    def test_subscriptions_page(self):
+        response = self.assert_page(
+            '/api/users/subscriptions/?limit=4&recipes_limit=3', 3, 4
+        )
+        for author in response.data['results']:
+            self.assertTrue(author['is_subscribed'])
+            self.assertEqual(len(author['recipes']), 3)
+        self.assert_page('/api/users/subscriptions/?limit=2', 3, 2)
+
+    def test_unsubscribe_skips_author_recipes(self):
+        author = Subscription.objects.filter(user=self.viewer).first().author
+        table = Recipe._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(any(f'FROM "{table}"' in query['sql']
+                             for query in queries))
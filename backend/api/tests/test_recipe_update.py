@@ -0,0 +1,123 @@
+from api.v1.shopping_cart import compute_shopping_cart_totals
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingCartTotal, Tag)
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipePartialUpdateTest(TestCase):
+    """
+    PATCH меняет только переданные поля и ингредиенты
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author',
+                                              email='author@example.com')
+        cls.buyer = User.objects.create_user(username='buyer',
+                                             email='buyer@example.com')
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.salt, cls.flour, cls.milk = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'молоко')
+        )
+        cls.recipe = Recipe.objects.create(author=cls.author, name='bread',
+                                           image='recipes/x.jpg', text='-',
+                                           cooking_time=5)
+        cls.recipe.tags.set([cls.tag])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe=cls.recipe, ingredient=cls.salt,
+                               amount=5),
+            IngredientInRecipe(recipe=cls.recipe, ingredient=cls.flour,
+                               amount=500),
+        ])
+        ShoppingCart.objects.create(user=cls.buyer, recipe=cls.recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, data):
+        return self.client.patch(f'/api/recipes/{self.recipe.id}/', data,
+                                 format='json')
+
+    def amounts(self):
+        return dict(IngredientInRecipe.objects.filter(
+            recipe=self.recipe
+        ).values_list('ingredient_id', 'amount'))
+
+    def assert_totals_consistent(self):
+        self.assertEqual(
+            {(total.user_id, total.ingredient_id): total.amount
+             for total in ShoppingCartTotal.objects.all()},
+            compute_shopping_cart_totals()
+        )
+
+    def test_patch_without_ingredients_keeps_them(self):
+        response = self.patch({'name': 'rye bread'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['name'], 'rye bread')
+        self.assertEqual(self.amounts(),
+                         {self.salt.id: 5, self.flour.id: 500})
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag])
+
+    def test_patch_changes_only_submitted_ingredient(self):
+        response = self.patch({
+            'ingredients': [{'id': self.salt.id, 'amount': 7}]
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.amounts(),
+                         {self.salt.id: 7, self.flour.id: 500})
+        self.assert_totals_consistent()
+
+    def test_patch_adds_and_removes_marked_ingredients(self):
+        response = self.patch({'ingredients': [
+            {'id': self.milk.id, 'amount': 300},
+            {'id': self.salt.id, 'remove': True},
+        ]})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.amounts(),
+                         {self.flour.id: 500, self.milk.id: 300})
+        self.assert_totals_consistent()
+
+    def test_patch_requires_amount_unless_removing(self):
+        response = self.patch({'ingredients': [{'id': self.salt.id}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.data)
+        self.assertEqual(self.amounts(),
+                         {self.salt.id: 5, self.flour.id: 500})
+
+    def test_remove_marker_rejected_outside_patch(self):
+        response = self.client.post('/api/recipes/', {
+            'name': 'soup', 'text': '-', 'cooking_time': 5,
+            'tags': [self.tag.id], 'image': None,
+            'ingredients': [{'id': self.salt.id, 'remove': True}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.data)
+
+    @override_settings(INGREDIENT_INDEX=False)
+    def test_ingredients_resolved_in_one_query(self):
+        data = {'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in (self.salt, self.flour, self.milk)
+        ]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(data)
+        self.assertEqual(response.status_code, 200, response.data)
+        table = Ingredient._meta.db_table
+        self.assertEqual(
+            sum(query['sql'].startswith('SELECT')
+                and f'FROM "{table}"' in query['sql']
+                for query in queries), 1
+        )
+        data['ingredients'].append({'id': 0, 'amount': 1})
+        response = self.patch(data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('0', str(response.data['ingredients']))
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.models import Recipe
+from recipes.search import update_search_documents
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipeSearchTest(TestCase):
+    """
+    Результаты ?search= идут по релевантности и листаются
+    по номеру страницы в любом режиме пагинации
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author',
+                                          email='author@example.com')
+        cls.by_text, cls.by_name, cls.other = [
+            Recipe.objects.create(author=author, name=name, text=text,
+                                  image='recipes/x.jpg', cooking_time=5)
+            for name, text in (('Суп', 'Добавьте блины к супу'),
+                               ('Блины', 'Тесто на молоке'),
+                               ('Каша', 'Овсянка'))
+        ]
+        update_search_documents(
+            Recipe.objects.values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def ids(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_name_match_ranks_first(self):
+        self.assertEqual(self.ids('search=блины'),
+                         [self.by_name.id, self.by_text.id])
+
+    def test_ranked_results_ignore_cursor_mode(self):
+        self.assertEqual(self.ids('search=блины&cursor=&limit=1'),
+                         [self.by_name.id])
+        self.assertEqual(self.ids('search=блины&limit=1&page=2'),
+                         [self.by_text.id])
+
+    def test_blank_search_keeps_feed_order(self):
+        self.assertEqual(self.ids('search=+'),
+                         [self.other.id, self.by_name.id, self.by_text.id])
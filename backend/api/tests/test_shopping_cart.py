@@ -0,0 +1,140 @@
+import zlib
+
+from api.v1.renderers import PDFShoppingCartRenderer
+from api.v1.shopping_cart import (apply_shopping_cart_delta,
+                                  compute_shopping_cart_totals)
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingCartTotal)
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class ShoppingCartTotalsTest(TestCase):
+    """
+    Итоги списков покупок совпадают с пересчётом по рецептам
+    при изменениях через API, админку и каскадные удаления
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.buyer, cls.other = [
+            User.objects.create_user(username=name,
+                                     email=f'{name}@example.com')
+            for name in ('author', 'buyer', 'other')
+        ]
+        cls.salt, cls.flour, cls.milk = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'молоко')
+        )
+        cls.bread, cls.pancakes = [
+            Recipe.objects.create(author=cls.author, name=name,
+                                  image='recipes/x.jpg', text='-',
+                                  cooking_time=5)
+            for name in ('bread', 'pancakes')
+        ]
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe=cls.bread, ingredient=cls.salt,
+                               amount=5),
+            IngredientInRecipe(recipe=cls.bread, ingredient=cls.flour,
+                               amount=500),
+            IngredientInRecipe(recipe=cls.pancakes, ingredient=cls.flour,
+                               amount=200),
+            IngredientInRecipe(recipe=cls.pancakes, ingredient=cls.milk,
+                               amount=300),
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+        for recipe in (self.bread, self.pancakes):
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        ShoppingCart.objects.create(user=self.other, recipe=self.bread)
+
+    def assert_totals_consistent(self):
+        stored = {
+            (total.user_id, total.ingredient_id): total.amount
+            for total in ShoppingCartTotal.objects.all()
+        }
+        self.assertEqual(stored, compute_shopping_cart_totals())
+
+    def test_add_through_api(self):
+        self.assertEqual(
+            ShoppingCartTotal.objects.get(user=self.buyer,
+                                          ingredient=self.flour).amount,
+            700
+        )
+        self.assert_totals_consistent()
+
+    def test_added_amounts_are_summed_into_existing_rows(self):
+        apply_shopping_cart_delta([self.buyer.id], {self.flour.id: 50})
+        apply_shopping_cart_delta([self.buyer.id], {self.flour.id: -750})
+        self.assertFalse(ShoppingCartTotal.objects.filter(
+            user=self.buyer, ingredient=self.flour
+        ).exists())
+
+    def test_remove_from_shopping_cart(self):
+        ShoppingCart.objects.filter(user=self.buyer,
+                                    recipe=self.bread).delete()
+        self.assert_totals_consistent()
+
+    def test_delete_recipe(self):
+        self.bread.delete()
+        self.assert_totals_consistent()
+
+    def test_delete_ingredient(self):
+        self.flour.delete()
+        self.assert_totals_consistent()
+
+    def test_delete_user(self):
+        self.buyer.delete()
+        self.assert_totals_consistent()
+
+    def test_edit_recipe_ingredient_row(self):
+        component = IngredientInRecipe.objects.get(recipe=self.bread,
+                                                   ingredient=self.salt)
+        component.amount = 7
+        component.save()
+        component.ingredient = self.milk
+        component.save()
+        IngredientInRecipe.objects.create(recipe=self.bread,
+                                          ingredient=self.salt, amount=1)
+        IngredientInRecipe.objects.get(recipe=self.pancakes,
+                                       ingredient=self.flour).delete()
+        self.assert_totals_consistent()
+
+    def test_update_recipe_ingredients_through_api(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(
+            f'/api/recipes/{self.bread.id}/',
+            {'ingredients': [{'id': self.flour.id, 'amount': 450},
+                             {'id': self.milk.id, 'amount': 100}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assert_totals_consistent()
+
+
+class PDFShoppingCartRendererTest(SimpleTestCase):
+    """
+    PDF со встроенным шрифтом, в котором есть все кодируемые символы
+    """
+
+    def test_font_is_embedded_with_widths_for_cyrillic(self):
+        renderer = PDFShoppingCartRenderer()
+        data = renderer.render([{'ingredient__name': 'Ёжевика',
+                                 'ingredient__measurement_unit': 'г',
+                                 'total_amount': 5}])
+        self.assertIn(b'/FontFile2 6 0 R', data)
+        self.assertNotIn(b'/Helvetica', data)
+        self.assertIn(renderer._encode('Ёжевика'), data)
+        font = renderer.get_font()
+        with open(renderer.font_path, 'rb') as file:
+            self.assertEqual(zlib.decompress(font['file']), file.read())
+        self.assertTrue(all(
+            font['widths'][code - 32] > 0
+            for code in renderer.codes.values()
+        ))
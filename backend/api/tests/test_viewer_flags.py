@@ -0,0 +1,80 @@
+import time
+
+from api.v1.flags import (VIEWER_OVERLAY_KEY, VIEWER_VERSION_KEY,
+                          get_viewer_version)
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+from foodgram.caches import state_cache
+from recipes.models import FavoriteRecipe, Recipe
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class ViewerEtagTest(TestCase):
+    """
+    ETag ответа зависит от версии флагов пользователя, а не от времени
+    построения закешированного набора флагов
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user',
+                                            email='user@example.com')
+        cls.recipe = Recipe.objects.create(author=cls.user, name='bread',
+                                           image='recipes/x.jpg', text='-',
+                                           cooking_time=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_etag_survives_overlay_expiry(self):
+        etag = self.get()['ETag']
+        version = get_viewer_version(self.user.id)
+        cache.delete(VIEWER_OVERLAY_KEY.format(self.user.id, version))
+        self.assertEqual(self.get()['ETag'], etag)
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_evicted_version_rebuilds_overlay(self):
+        etag = self.get()['ETag']
+        # без сигналов: версию меняет только вытеснение ключа
+        FavoriteRecipe.objects.bulk_create(
+            [FavoriteRecipe(user=self.user, recipe=self.recipe)]
+        )
+        cache.clear()
+        response = self.get()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertFalse(state_cache.has_key(
+            VIEWER_VERSION_KEY.format(self.user.id)
+        ))
+
+    def test_etag_changes_when_flags_change_outside_api(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.create(user=self.user, recipe=self.recipe)
+        response = self.get()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_if_modified_since_does_not_hide_flag_changes(self):
+        response = self.get()
+        self.assertFalse(response.has_header('Last-Modified'))
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.create(user=self.user, recipe=self.recipe)
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.id}/',
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.cooking_index import cooking_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class WhatToCookTest(TestCase):
+    """
+    Подбор рецептов по имеющимся ингредиентам: по убыванию покрытия,
+    затем по числу найденных ингредиентов и id
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author',
+                                          email='author@example.com')
+        cls.ingredients = dict(zip('abcd', Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in 'abcd'
+        )))
+        cls.recipes = {}
+        for name, components in (('toast', 'ab'), ('salad', 'abc'),
+                                 ('stew', 'acd'), ('tea', 'd'),
+                                 ('sandwich', 'ab')):
+            recipe = Recipe.objects.create(author=author, name=name,
+                                           image='recipes/x.jpg', text='-',
+                                           cooking_time=5)
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(recipe=recipe,
+                                   ingredient=cls.ingredients[letter],
+                                   amount=1)
+                for letter in components
+            )
+            cls.recipes[recipe.id] = name
+
+    def setUp(self):
+        self.client = APIClient()
+        # индекс процесса мог остаться от других тестов
+        cooking_index._data = None
+
+    def cook(self, letters, **params):
+        query = '&'.join(
+            [f'ingredients={self.ingredients[letter].id}'
+             for letter in letters]
+            + [f'{key}={value}' for key, value in params.items()]
+        )
+        response = self.client.get(f'/api/recipes/what_to_cook/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            (self.recipes[recipe['id']], recipe['coverage'],
+             [self.ingredients_by_id()[pk]
+              for pk in recipe['missing_ingredients']])
+            for recipe in response.data['results']
+        ]
+
+    def ingredients_by_id(self):
+        return {ingredient.id: letter
+                for letter, ingredient in self.ingredients.items()}
+
+    def test_ranked_by_coverage(self):
+        self.assertEqual(self.cook('ab'), [
+            ('sandwich', 1.0, []),
+            ('toast', 1.0, []),
+            ('salad', 0.667, ['c']),
+            ('stew', 0.333, ['c', 'd']),
+        ])
+
+    def test_max_missing(self):
+        self.assertEqual(
+            [name for name, _, _ in self.cook('ab', max_missing=1)],
+            ['sandwich', 'toast', 'salad']
+        )
+        self.assertEqual(
+            [name for name, _, _ in self.cook('ab', max_missing=0)],
+            ['sandwich', 'toast']
+        )
+
+    def test_more_matches_win_coverage_ties(self):
+        self.assertEqual(self.cook('d'), [
+            ('tea', 1.0, []),
+            ('stew', 0.333, ['a', 'c']),
+        ])
+        self.assertEqual(
+            [name for name, _, _ in self.cook('acd')][:2], ['stew', 'tea']
+        )
+
+    def test_unknown_ingredient_and_validation(self):
+        response = self.client.get(
+            '/api/recipes/what_to_cook/?ingredients=999999'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get('/api/recipes/what_to_cook/')
+        self.assertEqual(response.status_code, 400)
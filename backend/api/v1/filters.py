@@ -1,18 +1,38 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Case, Exists, IntegerField, OuterRef, When
+from django.db.models.functions import Lower
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+from recipes.tag_index import tag_index
 
 User = get_user_model()
 
 
+def get_tag_choices():
+    return tag_index.choices()
+
+
 class RecipeFilter(FilterSet):
     """
-    Фильтр Рецептов
+    Фильтр Рецептов.
+    Теги проверяются подзапросом EXISTS по связующей таблице, без JOIN
+    и DISTINCT; ?tags_match=any - любой из тегов, all - все сразу.
+    ?search= - полнотекстовый поиск по названию, ингредиентам и описанию,
+    результаты упорядочены по релевантности.
     """
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    TAGS_MATCH_ANY = 'any'
+    TAGS_MATCH_ALL = 'all'
+    tags_match_default = TAGS_MATCH_ANY
+
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='filter_tags',
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, 'Любой из тегов'),
+                 (TAGS_MATCH_ALL, 'Все теги')),
+        method='filter_tags_match',
     )
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all()
@@ -23,6 +43,31 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited',
     )
+    search = filters.CharFilter(method='filter_search')
+
+    def filter_tags(self, queryset, name, value):
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        )
+        tag_ids = tag_index.get_ids(value)
+        match = self.form.cleaned_data.get('tags_match')
+        if (match or self.tags_match_default) == self.TAGS_MATCH_ALL:
+            for tag_id in tag_ids:
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag_id=tag_id))
+                )
+            return queryset
+        return queryset.filter(
+            Exists(recipe_tags.filter(tag_id__in=tag_ids))
+        )
+
+    def filter_tags_match(self, queryset, name, value):
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
@@ -38,12 +83,41 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author')
+        fields = ('tags', 'tags_match', 'author')
 
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    """
+    Фильтр ингредиентов для автодополнения.
+    Короткие запросы ищутся по началу названия, длинные - по вхождению,
+    совпадения с начала названия идут первыми. Порядок тот же, что
+    у справочника в памяти, который этот фильтр заменяет, пока
+    справочник выключен или строится.
+    """
+    contains_min_length = 3
+
+    name = filters.CharFilter(method='filter_name')
+    measurement_unit = filters.CharFilter()
+
+    def filter_name(self, queryset, name, value):
+        value = value.strip().lower()
+        if not value:
+            return queryset
+        queryset = queryset.alias(name_lower=Lower('name'))
+        if len(value) < self.contains_min_length:
+            return queryset.filter(
+                name_lower__startswith=value
+            ).order_by('name_lower', 'id')
+        return queryset.filter(
+            name_lower__contains=value
+        ).annotate(
+            prefix_rank=Case(
+                When(name_lower__startswith=value, then=0),
+                default=1,
+                output_field=IntegerField()
+            )
+        ).order_by('prefix_rank', 'name_lower', 'id')
 
     class Meta:
         model = Ingredient
-        fields = ('name', )
+        fields = ('name', 'measurement_unit')
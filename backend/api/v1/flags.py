@@ -0,0 +1,121 @@
+import time
+
+from django.core.cache import cache
+from recipes.models import FavoriteRecipe, ShoppingCart
+from users.models import Subscription
+
+VIEWER_FLAGS_KEY = 'viewer_flags'
+VIEWER_OVERLAY_KEY = 'viewer_overlay:{}:{}'
+VIEWER_OVERLAY_TIMEOUT = 60 * 10
+VIEWER_VERSION_KEY = 'viewer_version:{}'
+VIEWER_VERSION_TIMEOUT = 60 * 60 * 24
+
+
+class ViewerFlags:
+    """
+    Флаги текущего пользователя: избранное, список покупок, подписки.
+    Загружаются одним запросом на связь для всей страницы.
+    """
+    relations = {
+        'favorited': (FavoriteRecipe, 'recipe_id'),
+        'in_shopping_cart': (ShoppingCart, 'recipe_id'),
+        'subscribed': (Subscription, 'author_id'),
+    }
+
+    def __init__(self, user):
+        self.user = user
+        self._checked = {relation: set() for relation in self.relations}
+        self._marked = {relation: set() for relation in self.relations}
+
+    def _remember(self, relation, obj_id, value):
+        self._checked[relation].add(obj_id)
+        if value:
+            self._marked[relation].add(obj_id)
+
+    def load(self, relation, ids):
+        ids = set(ids) - self._checked[relation] - {None}
+        if not ids or self.user.is_anonymous:
+            return
+        model, field = self.relations[relation]
+        self._marked[relation].update(
+            model.objects.filter(
+                user=self.user,
+                **{f'{field}__in': ids}
+            ).values_list(field, flat=True)
+        )
+        self._checked[relation].update(ids)
+
+    def has(self, relation, obj_id):
+        if self.user.is_anonymous:
+            return False
+        self.load(relation, (obj_id, ))
+        return obj_id in self._marked[relation]
+
+    def prime(self, relation, objects):
+        """
+        Учитывает аннотации queryset'а и догружает недостающие флаги.
+        """
+        if self.user.is_anonymous:
+            return
+        missing = []
+        for obj in objects:
+            value = getattr(obj, f'is_{relation}', None)
+            if value is None:
+                missing.append(obj.id)
+            else:
+                self._remember(relation, obj.id, value)
+        self.load(relation, missing)
+
+    def prime_recipes(self, recipes):
+        self.prime('favorited', recipes)
+        self.prime('in_shopping_cart', recipes)
+        self.load('subscribed', (recipe.author_id for recipe in recipes))
+
+    def prime_users(self, users):
+        self.prime('subscribed', users)
+
+
+def get_viewer_flags(context):
+    """
+    Общий для всех вложенных сериализаторов объект флагов запроса.
+    """
+    if VIEWER_FLAGS_KEY not in context:
+        context[VIEWER_FLAGS_KEY] = ViewerFlags(context['request'].user)
+    return context[VIEWER_FLAGS_KEY]
+
+
+def get_viewer_version(user_id):
+    """
+    Версия избранного, списка покупок и подписок пользователя, по которой
+    сверяются ETag и набор флагов. Хранится в основном кеше со сроком:
+    после вытеснения берётся новая версия от времени, и набор флагов
+    просто строится заново.
+    """
+    key = VIEWER_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, VIEWER_VERSION_TIMEOUT)
+        version = cache.get(key, time.time_ns() // 1000)
+    return version
+
+
+def get_viewer_overlay(user):
+    """
+    Все id избранного, списка покупок и подписок пользователя,
+    закешированные для наложения на общий ответ
+    """
+    key = VIEWER_OVERLAY_KEY.format(user.id, get_viewer_version(user.id))
+    overlay = cache.get(key)
+    if overlay is None:
+        overlay = {
+            relation: set(
+                model.objects.filter(user=user).values_list(field, flat=True)
+            )
+            for relation, (model, field) in ViewerFlags.relations.items()
+        }
+        cache.set(key, overlay, VIEWER_OVERLAY_TIMEOUT)
+    return overlay
+
+
+def invalidate_viewer_overlay(user_id):
+    cache.delete(VIEWER_VERSION_KEY.format(user_id))
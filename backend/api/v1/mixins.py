@@ -1,7 +1,30 @@
+from copy import deepcopy
+from hashlib import md5
+
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from foodgram.caches import BufferedCounters
+from recipes.versions import get_version
 from rest_framework import generics, status, viewsets
 from rest_framework.response import Response
 
+from .flags import get_viewer_overlay, get_viewer_version
+
+CACHE_STATS_KEYS = {'hit': 'response_cache_hits',
+                    'miss': 'response_cache_misses'}
+
+cache_stats = BufferedCounters(CACHE_STATS_KEYS)
+
+
+def get_cache_stats():
+    return cache_stats.get()
+
+
+def reset_cache_stats():
+    cache_stats.reset()
+
 
 class CreateDestroyObjView(generics.CreateAPIView,
                            generics.DestroyAPIView,
@@ -47,3 +70,155 @@ class CreateDestroyObjView(generics.CreateAPIView,
         )
         connect.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AnonymousCacheMixin:
+    """
+    Кеширование list/retrieve для анонимных пользователей.
+    Ключ содержит версию данных cache_version_name, поэтому
+    изменение данных делает старые записи недоступными.
+    """
+    cache_version_name = None
+    cache_timeout = 60 * 5
+
+    def _get_cache_key(self, request, action):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        raw = (f'{request.get_host()}|{action}|{self.kwargs}|{params}'
+               f'|{request.accepted_media_type}')
+        version = get_version(self.cache_version_name)
+        return (f'response:{self.cache_version_name}:{version}:'
+                f'{md5(raw.encode()).hexdigest()}')
+
+    def is_cacheable(self, request):
+        return not request.user.is_authenticated
+
+    def personalize(self, request, data):
+        return data
+
+    def depersonalize(self, request, data):
+        return data
+
+    def _get_cached(self, request, action):
+        """
+        Ключ кеша и готовый ответ, если он есть в кеше
+        """
+        if not self.is_cacheable(request):
+            return None, None
+        key = self._get_cache_key(request, action)
+        data = cache.get(key)
+        if data is None:
+            cache_stats.count('miss')
+            return key, None
+        cache_stats.count('hit')
+        response = Response(self.personalize(request, data))
+        response['X-Cache'] = 'HIT'
+        return key, response
+
+    def _store_cached(self, request, key, response):
+        if key is None:
+            return
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, self.depersonalize(request, response.data),
+                      self.cache_timeout)
+        response['X-Cache'] = 'MISS'
+
+    def _cached_response(self, request, action, handler, *args, **kwargs):
+        key, response = self._get_cached(request, action)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            self._store_cached(request, key, response)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(request, 'list', super().list,
+                                     *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(request, 'retrieve', super().retrieve,
+                                     *args, **kwargs)
+
+
+class PersonalizedCacheMixin(AnonymousCacheMixin):
+    """
+    Кеш для всех пользователей: общий ответ хранится без личных флагов,
+    а для авторизованного пользователя флаги накладываются из его
+    закешированных id избранного, покупок и подписок.
+    Запросы с параметрами из cache_bypass_params не кешируются.
+    """
+    cache_bypass_params = ()
+
+    def apply_viewer_flags(self, data, overlay):
+        """
+        Наложение флагов из overlay на данные ответа (None - снятие).
+        По умолчанию в ответе нет личных флагов.
+        """
+        return data
+
+    def is_cacheable(self, request):
+        return not (request.user.is_authenticated
+                    and any(param in request.query_params
+                            for param in self.cache_bypass_params))
+
+    def personalize(self, request, data):
+        if not request.user.is_authenticated:
+            return data
+        return self.apply_viewer_flags(data,
+                                       get_viewer_overlay(request.user))
+
+    def depersonalize(self, request, data):
+        if not request.user.is_authenticated:
+            return data
+        return self.apply_viewer_flags(deepcopy(data), None)
+
+
+class ConditionalGetMixin:
+    """
+    ETag для list/retrieve. Валидатор считается по версиям данных
+    без сериализации, поэтому 304 отдаётся до выборки queryset'а.
+    При etag_per_user в ETag входит версия флагов пользователя.
+    Last-Modified не отдаётся: ответ меняется и без изменения рецепта
+    (флаги пользователя, названия ингредиентов), а время таких
+    изменений не хранится.
+    """
+    etag_version_name = None
+    etag_per_user = False
+
+    def get_etag(self, request, action):
+        version = get_version(self.etag_version_name)
+        etag = f'{self.etag_version_name}-{action}-{version}'
+        if self.etag_per_user and request.user.is_authenticated:
+            etag += (f'-u{request.user.id}'
+                     f'-{get_viewer_version(request.user.id)}')
+        return etag
+
+    def _check_conditions(self, request, action):
+        """
+        ETag ответа и 304, если клиентская копия актуальна
+        """
+        etag = quote_etag(self.get_etag(request, action))
+        return etag, get_conditional_response(request, etag=etag)
+
+    def _set_validators(self, response, etag):
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+
+    def _conditional_response(self, request, action, handler, *args,
+                              **kwargs):
+        etag, response = self._check_conditions(request, action)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            self._set_validators(response, etag)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(request, 'list', super().list,
+                                          *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(request, 'retrieve',
+                                          super().retrieve, *args, **kwargs)
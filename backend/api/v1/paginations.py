@@ -1,6 +1,178 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db import connections
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class RecipePagination(CustomPagination):
+    """
+    Пагинация ленты рецептов.
+    ?page= - постранично (как раньше), ?cursor= - по ключу (pub_date, id)
+    без OFFSET; ?count=exact|estimated|none управляет подсчётом записей.
+    Результаты поиска (представление выставляет search_ranked)
+    сохраняют порядок по релевантности и листаются по номеру страницы.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_modes = ('exact', 'estimated', 'none')
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def _set_modes(self, request, view):
+        self.request = request
+        self.ranked = getattr(view, 'search_ranked', False)
+        self.cursor_mode = (self.cursor_query_param in request.query_params
+                            and not self.ranked)
+        self.count_mode = request.query_params.get(
+            self.count_query_param,
+            'none' if self.cursor_mode else 'exact'
+        )
+        if self.count_mode not in self.count_modes:
+            self.count_mode = 'exact'
+
+    def _is_page_number_mode(self):
+        return not self.cursor_mode and self.count_mode == 'exact'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._set_modes(request, view)
+        if self._is_page_number_mode():
+            return super().paginate_queryset(queryset, request, view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        queryset = self._order(queryset)
+        self.count = self._get_count(queryset)
+        results = list(self._get_page_queryset(queryset, page_size))
+        if not (results or self.cursor_mode or self.page_number == 1):
+            raise NotFound(self.invalid_page_message)
+        return self._set_results(results, page_size)
+
+    def _order(self, queryset):
+        if self.ranked:
+            return queryset
+        return queryset.order_by(*self.ordering)
+
+    def _get_page_queryset(self, queryset, page_size):
+        if self.cursor_mode:
+            return self._paginate_by_cursor(queryset, page_size)
+        return self._paginate_by_offset(queryset, page_size)
+
+    def _set_results(self, results, page_size):
+        self.has_next = len(results) > page_size
+        self.results = results[:page_size]
+        return self.results
+
+    def _get_count(self, queryset):
+        if self.count_mode == 'exact':
+            return queryset.count()
+        if self.count_mode == 'estimated':
+            return estimate_count(queryset)
+        return None
+
+    def _paginate_by_cursor(self, queryset, page_size):
+        cursor = self.request.query_params[self.cursor_query_param]
+        if cursor:
+            pub_date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                pub_date__lte=pub_date
+            ).exclude(
+                pub_date=pub_date, pk__gte=pk
+            )
+        return queryset[:page_size + 1]
+
+    def _paginate_by_offset(self, queryset, page_size):
+        try:
+            self.page_number = int(
+                self.request.query_params.get(self.page_query_param, 1)
+            )
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.page_number - 1) * page_size
+        return queryset[offset:offset + page_size + 1]
+
+    def encode_cursor(self, obj):
+        value = f'{obj.pub_date.isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            pub_date, pk = value.split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not (self.cursor_mode or self.count_mode != 'exact'):
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.cursor_mode:
+            return replace_query_param(url, self.cursor_query_param,
+                                       self.encode_cursor(self.results[-1]))
+        return replace_query_param(url, self.page_query_param,
+                                   self.page_number + 1)
+
+    def get_previous_link(self):
+        if not (self.cursor_mode or self.count_mode != 'exact'):
+            return super().get_previous_link()
+        if self.cursor_mode or self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param,
+                                   self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if not (self.cursor_mode or self.count_mode != 'exact'):
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк по плану запроса PostgreSQL;
+    на других СУБД - точный COUNT(*)
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LimitedResultsPagination(BasePagination):
+    """
+    Ограничение размера выдачи без разбиения на страницы
+    """
+    max_results = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return list(queryset[:self.max_results])
+
+    def get_paginated_response(self, data):
+        return Response(data)
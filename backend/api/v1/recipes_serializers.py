@@ -1,13 +1,25 @@
 import base64
+import binascii
+from collections import Counter
+from tempfile import SpooledTemporaryFile
 
 import webcolors
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Manager
+from PIL import Image
+from recipes.images import get_image_settings, open_image
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
                             Recipe, ShoppingCart, Tag)
+from recipes.tasks import reset_recipe_image, schedule_recipe_image
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
-from .users_serializers import UserReadSerializer
+from .flags import get_viewer_flags
+from .shopping_cart import update_recipe_in_totals
+from .users_serializers import ImageRenditionField, UserReadSerializer
 
 User = get_user_model()
 
@@ -29,14 +41,67 @@ class Hex2NameColor(serializers.Field):
 
 class Base64ImageField(serializers.ImageField):
     """
-    Форматирование изображения в строковый формат.
+    Изображение строкой data:image/...;base64 или файлом multipart-формы.
+    base64 декодируется частями во временный файл, размер проверяется
+    по длине строки, до декодирования.
     """
+    marker = ';base64,'
+    whitespace = b' \t\r\n\v\f'
+    chunk_size = 64 * 1024
+    spool_size = 1024 * 1024
+    default_error_messages = {
+        'max_size': 'Размер изображения больше {max_size} КБ.',
+        'invalid_base64': 'Некорректная строка base64.',
+    }
+
+    def _decode(self, data, start):
+        """
+        Пробелы и переносы строк (base64 по 76 символов в строке)
+        отбрасываются, а остаток части, не кратный 4 символам,
+        переносится в следующую
+        """
+        file = SpooledTemporaryFile(max_size=self.spool_size)
+        rest = b''
+        try:
+            for position in range(start, len(data), self.chunk_size):
+                chunk = rest + data[
+                    position:position + self.chunk_size
+                ].encode('ascii').translate(None, self.whitespace)
+                aligned = len(chunk) - len(chunk) % 4
+                file.write(base64.b64decode(chunk[:aligned]))
+                rest = chunk[aligned:]
+            if rest:
+                file.write(base64.b64decode(rest))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_base64')
+        file.seek(0)
+        return file
+
+    def _verify(self, file):
+        try:
+            Image.open(file).verify()
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+
     def to_internal_value(self, data):
+        max_size = get_image_settings()['MAX_UPLOAD_SIZE']
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+            start = data.find(self.marker)
+            if start == -1:
+                self.fail('invalid_base64')
+            ext = data[len('data:image/'):start]
+            start += len(self.marker)
+            if (len(data) - start) * 3 // 4 > max_size:
+                self.fail('max_size', max_size=max_size // 1024)
+            data = File(self._decode(data, start), name='temp.' + ext)
+        elif getattr(data, 'size', 0) > max_size:
+            self.fail('max_size', max_size=max_size // 1024)
+        file = serializers.FileField.to_internal_value(self, data)
+        self._verify(file)
+        return file
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -60,15 +125,85 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class IngredientPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """
+    id ингредиента без запроса к БД. Существование всех ингредиентов
+    рецепта проверяется сразу в RecipeCreateSerializer.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """
+    Список связанных объектов, проверяемый одним запросом in_bulk.
+    """
+    default_error_messages = {
+        'does_not_exist': 'Объекты с id {pk_values} не существуют.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        ids = []
+        for value in data:
+            if isinstance(value, bool):
+                self.child_relation.fail('incorrect_type',
+                                         data_type=type(value).__name__)
+            try:
+                pk = int(value)
+            except (TypeError, ValueError):
+                self.child_relation.fail('incorrect_type',
+                                         data_type=type(value).__name__)
+            if pk not in ids:
+                ids.append(pk)
+        objects = self.child_relation.get_queryset().in_bulk(ids)
+        missing = [pk for pk in ids if pk not in objects]
+        if missing:
+            self.fail('does_not_exist',
+                      pk_values=', '.join(map(str, missing)))
+        return [objects[pk] for pk in ids]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при many=True проверяет все id сразу.
+    """
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
 class IngredientInRecipeCreateSerializer(serializers.ModelSerializer):
     """
     Сериализатор для ингредиентов при создании рецепта.
+    remove - удаление ингредиента из рецепта при частичном обновлении.
     """
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = IngredientPrimaryKeyField(queryset=Ingredient.objects.all())
+    remove = serializers.BooleanField(default=False, write_only=True)
 
     class Meta:
         model = IngredientInRecipe
-        fields = ('id', 'amount')
+        fields = ('id', 'amount', 'remove')
+
+    def validate(self, data):
+        # при PATCH обязательные поля вложенных объектов не проверяются
+        if not data.get('remove') and 'amount' not in data:
+            raise serializers.ValidationError(
+                {'amount': 'Обязательное поле.'}
+            )
+        return data
 
 
 class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
@@ -86,6 +221,16 @@ class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'amount', 'measurement_unit')
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Список рецептов: флаги пользователя загружаются на всю страницу сразу.
+    """
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        get_viewer_flags(self.context).prime_recipes(recipes)
+        return super().to_representation(recipes)
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
     """
     Просмотр рецептов.
@@ -97,36 +242,71 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField('get_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField('get_shopping')
     image = Base64ImageField(allow_null=True)
+    image_detail = ImageRenditionField('detail')
+    image_card = ImageRenditionField('card')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'author', 'name', 'image', 'tags',
-                  'cooking_time', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'text')
+        fields = ('id', 'author', 'name', 'image', 'image_detail',
+                  'image_card', 'image_status', 'tags', 'cooking_time',
+                  'ingredients', 'is_favorited', 'is_in_shopping_cart',
+                  'text')
+        list_serializer_class = RecipeListSerializer
+
+    def _get_flag(self, obj, relation):
+        annotated = getattr(obj, f'is_{relation}', None)
+        if annotated is not None:
+            return annotated
+        return get_viewer_flags(self.context).has(relation, obj.id)
 
     def get_favorited(self, obj):
-        if self.context['request'].user.is_anonymous:
-            return False
-        return FavoriteRecipe.objects.filter(
-            user=self.context['request'].user,
-            recipe=obj
-        ).exists()
+        return self._get_flag(obj, 'favorited')
 
     def get_shopping(self, obj):
-        if self.context['request'].user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(
-            user=self.context['request'].user,
-            recipe=obj
-        ).exists()
+        return self._get_flag(obj, 'in_shopping_cart')
+
+
+class CookingQuerySerializer(serializers.Serializer):
+    """
+    Параметры подбора рецептов по имеющимся ингредиентам.
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=100
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
+class RecipeCoverageSerializer(RecipeReadSerializer):
+    """
+    Рецепт в подборе по ингредиентам: доля имеющихся ингредиентов
+    и id недостающих.
+    """
+    coverage = serializers.SerializerMethodField()
+    missing_ingredients = serializers.SerializerMethodField()
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ('coverage',
+                                                     'missing_ingredients')
+
+    def get_coverage(self, obj):
+        return round(obj.matched_count / obj.required_count, 3)
+
+    def get_missing_ingredients(self, obj):
+        available = self.context['ingredients']
+        return [
+            component.ingredient_id
+            for component in obj.recipe_ingredient.all()
+            if component.ingredient_id not in available
+        ]
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """
     Создание рецепта.
     """
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
     ingredients = IngredientInRecipeCreateSerializer(many=True)
     image = Base64ImageField(allow_null=True)
 
@@ -135,6 +315,52 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         fields = ('name', 'text', 'cooking_time',
                   'image', 'tags', 'ingredients')
 
+    def validate_image(self, value):
+        if value is not None:
+            open_image(value)
+        return value
+
+    def _get_ingredients(self, ids):
+        """
+        Ингредиенты по id: из справочника в памяти, а пока он выключен
+        или строится - одним запросом к БД
+        """
+        index = ingredient_index.snapshot()
+        if index is None:
+            return Ingredient.objects.in_bulk(ids)
+        found = {}
+        for pk in ids:
+            ingredient = index.get(pk)
+            if ingredient is not None:
+                found[pk] = Ingredient(**ingredient)
+        return found
+
+    def validate_ingredients(self, value):
+        counts = Counter(component['id'] for component in value)
+        duplicates = [pk for pk, count in counts.items() if count > 1]
+        if duplicates:
+            raise serializers.ValidationError(
+                'Ингредиенты указаны повторно: '
+                + ', '.join(map(str, duplicates))
+            )
+        if not self.partial and any(
+            component.get('remove') for component in value
+        ):
+            raise serializers.ValidationError(
+                'Удалять ингредиенты отметкой remove можно только '
+                'при частичном обновлении (PATCH).'
+            )
+        ingredients = self._get_ingredients(list(counts))
+        missing = [pk for pk in counts if pk not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                'Ингредиенты с id ' + ', '.join(map(str, missing))
+                + ' не существуют.'
+            )
+        for component in value:
+            component['id'] = ingredients[component['id']]
+        return value
+
     def _create_ingredients_in_recipe(self, recipe, ingredients_data):
         return IngredientInRecipe.objects.bulk_create(
             IngredientInRecipe(
@@ -145,33 +371,102 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, instance):
+        instance = Recipe.objects.for_read(
+            self.context['request'].user
+        ).get(pk=instance.pk)
         serializer = RecipeReadSerializer(instance, context=self.context)
         return serializer.data
 
+    def _update_ingredients_in_recipe(self, recipe, ingredients_data,
+                                      replace=True):
+        """
+        Применение только изменений состава: новые строки создаются,
+        изменённые обновляются, лишние удаляются одним запросом.
+        replace=False (PATCH) - не переданные ингредиенты остаются,
+        удаляются только отмеченные remove.
+        """
+        existing = {
+            component.ingredient_id: component
+            for component in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: component.amount
+            for ingredient_id, component in existing.items()
+        }
+        new_amounts = {
+            component['id'].id: component['amount']
+            for component in ingredients_data
+            if not component.get('remove')
+        }
+        if replace:
+            removed = old_amounts.keys() - new_amounts.keys()
+        else:
+            removed = old_amounts.keys() & {
+                component['id'].id for component in ingredients_data
+                if component.get('remove')
+            }
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            component = existing.get(ingredient_id)
+            if component is not None and component.amount != amount:
+                component.amount = amount
+                changed.append(component)
+        IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        self._create_ingredients_in_recipe(
+            recipe=recipe,
+            ingredients_data=[
+                component for component in ingredients_data
+                if component['id'].id not in existing
+                and not component.get('remove')
+            ]
+        )
+        # удалённые строки вычитает из итогов сигнал pre_delete
+        update_recipe_in_totals(
+            recipe.id,
+            {ingredient_id: amount
+             for ingredient_id, amount in old_amounts.items()
+             if ingredient_id in new_amounts},
+            new_amounts
+        )
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
-        new_recipe = Recipe.objects.create(**validated_data)
+        new_recipe = Recipe(**validated_data)
+        reset_recipe_image(new_recipe)
+        new_recipe.save()
+        schedule_recipe_image(new_recipe)
         new_recipe.tags.set(tags)
         self._create_ingredients_in_recipe(recipe=new_recipe,
                                            ingredients_data=ingredients_data)
-        new_recipe.save()
         return new_recipe
 
+    @transaction.atomic
     def update(self, instance: Recipe, validated_data):
-        ingredients = IngredientInRecipe.objects.filter(recipe=instance)
-        ingredients.delete()
-        new_ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get('cooking_time',
-                                                   instance.cooking_time)
-        instance.image = validated_data.get('image', instance.image)
-        instance.tags.set(tags)
-        self._create_ingredients_in_recipe(recipe=instance,
-                                           ingredients_data=new_ingredients)
+        ingredients_data = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        image_changed = 'image' in validated_data
+        if image_changed:
+            reset_recipe_image(instance)
         instance.save()
+        if image_changed:
+            schedule_recipe_image(instance)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients_data is not None:
+            self._update_ingredients_in_recipe(
+                recipe=instance,
+                ingredients_data=ingredients_data,
+                replace=not self.partial
+            )
         return instance
 
 
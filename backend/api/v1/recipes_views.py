@@ -1,105 +1,258 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, OuterRef
-from django.http import FileResponse
-from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
-                            Recipe, ShoppingCart, Tag)
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from recipes.cooking_index import cooking_index
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
+                            Tag)
+from recipes.recommendations import get_feed_recipe_ids
+from recipes.similarity import get_similarity_settings
+from recipes.versions import INGREDIENTS, RECIPES, TAGS
 from rest_framework import permissions, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
 
 from .filters import IngredientFilter, RecipeFilter
-from .mixins import CreateDestroyObjView
-from .paginations import CustomPagination
+from .flags import get_viewer_overlay
+from .mixins import (ConditionalGetMixin, CreateDestroyObjView,
+                     PersonalizedCacheMixin)
+from .paginations import (CustomPagination, LimitedResultsPagination,
+                          RecipePagination)
 from .permissions import AccessUpdateAndDelete
-from .recipes_serializers import (FavoriteSerializer, IngredientSerializer,
+from .recipes_serializers import (CookingQuerySerializer, FavoriteSerializer,
+                                  IngredientSerializer,
+                                  RecipeCoverageSerializer,
                                   RecipeCreateSerializer, RecipeReadSerializer,
                                   ShoppingCartSerializer, TagSerializer)
-from .shopping_cart import create_shopping_cart
+from .renderers import SHOPPING_CART_RENDERERS
+from .shopping_cart import get_shopping_cart_totals
 from .users_serializers import RecipeFromTheAuthor
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Вьюсет тегов. Только чтение
     """
+    etag_version_name = TAGS
     queryset = Tag.objects.all()
     pagination_class = None
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientIndexViewSet(viewsets.ReadOnlyModelViewSet):
     """
-    Вьюсет ингредиентов. Только чтение
+    Чтение ингредиентов из справочника в памяти, без запросов к БД.
+    Пока справочник выключен или строится, чтение идёт из БД
+    через IngredientFilter.
     """
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filterset_class = IngredientFilter
-    pagination_class = None
-    search_fields = ('^name', )
+    pagination_class = LimitedResultsPagination
+    lookup_value_regex = r'\d+'
+
+    def list(self, request, *args, **kwargs):
+        index = ingredient_index.snapshot()
+        if index is None:
+            return super().list(request, *args, **kwargs)
+        ingredients = index.search(
+            name=request.query_params.get('name', ''),
+            measurement_unit=request.query_params.get('measurement_unit'),
+            limit=self.pagination_class.max_results,
+            contains_min_length=IngredientFilter.contains_min_length
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        index = ingredient_index.snapshot()
+        if index is None:
+            return super().retrieve(request, *args, **kwargs)
+        ingredient = index.get(int(kwargs['pk']))
+        if ingredient is None:
+            raise NotFound
+        return Response(self.get_serializer(ingredient).data)
+
 
+class IngredientViewSet(ConditionalGetMixin, IngredientIndexViewSet):
+    """
+    Вьюсет ингредиентов. Только чтение
+    """
+    etag_version_name = INGREDIENTS
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(ConditionalGetMixin, PersonalizedCacheMixin,
+                    viewsets.ModelViewSet):
     """
     Вьюсет рецептов
     """
+    cache_version_name = RECIPES
+    etag_version_name = RECIPES
+    etag_per_user = True
+    cache_bypass_params = ('is_favorited', 'is_in_shopping_cart')
     serializer_class = RecipeReadSerializer
     permission_classes = (AccessUpdateAndDelete, )
     filterset_class = RecipeFilter
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
+    lookup_value_regex = r'\d+'
 
     def get_serializer_class(self):
         if self.request.method not in permissions.SAFE_METHODS:
             return RecipeCreateSerializer
         return super().get_serializer_class()
 
+    def _get_recipe_dates(self):
+        if not hasattr(self, '_recipe_dates'):
+            self._recipe_dates = Recipe.objects.filter(
+                pk=self.kwargs['pk']
+            ).values_list('pub_date', 'updated_at').first()
+        return self._recipe_dates
+
+    def get_etag(self, request, action):
+        etag = super().get_etag(request, action)
+        if action == 'retrieve' and self._get_recipe_dates():
+            pub_date, updated_at = self._get_recipe_dates()
+            etag += (f'-{self.kwargs["pk"]}-{int(pub_date.timestamp())}'
+                     f'-{int(updated_at.timestamp() * 1000)}')
+        return etag
+
+    def apply_viewer_flags(self, data, overlay):
+        overlay = overlay or {}
+        recipes = data['results'] if 'results' in data else (data, )
+        for recipe in recipes:
+            recipe['is_favorited'] = (
+                recipe['id'] in overlay.get('favorited', ())
+            )
+            recipe['is_in_shopping_cart'] = (
+                recipe['id'] in overlay.get('in_shopping_cart', ())
+            )
+            if recipe['author'] is not None:
+                recipe['author']['is_subscribed'] = (
+                    recipe['author']['id'] in overlay.get('subscribed', ())
+                )
+        return data
+
     def get_queryset(self):
-        queryset = Recipe.objects.select_related(
-            'author'
-        ).prefetch_related(
-            'ingredients',
-            'tags'
+        if self.request.method not in permissions.SAFE_METHODS:
+            return Recipe.objects.all()
+        return Recipe.objects.for_read(self.request.user)
+
+    def filter_queryset(self, queryset):
+        # результаты ?search= упорядочены по релевантности, пагинатор
+        # сохраняет этот порядок
+        self.search_ranked = bool(
+            self.request.query_params.get('search', '').strip()
         )
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    FavoriteRecipe.objects.filter(
-                        user=user,
-                        recipe=OuterRef('pk')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=user,
-                        recipe=OuterRef('pk')
-                    )
-                )
-            )
-        return queryset
+        return super().filter_queryset(queryset)
 
     def perform_create(self, serializer):
         serializer.is_valid(raise_exception=True)
         serializer.save(author=self.request.user)
 
     """
-    Скачивание файла .TXT списка покупок
+    Скачивание списка покупок в формате TXT, CSV, JSON или PDF.
+    Формат выбирается параметром ?format= или заголовком Accept
     """
     @action(
         methods=['GET'],
         detail=False,
-        permission_classes=(permissions.IsAuthenticated, )
+        permission_classes=(permissions.IsAuthenticated, ),
+        renderer_classes=SHOPPING_CART_RENDERERS
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
+        renderer = request.accepted_renderer
+        totals = get_shopping_cart_totals(request.user)
+        file_name = f"shopping_list.{renderer.format}"
+        response = StreamingHttpResponse(
+            renderer.stream(totals.iterator()),
+            content_type=renderer.content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{file_name}"'
         )
-        shopping_list = create_shopping_cart(ingredients)
-        file_name = "shopping_list.txt"
-        response = FileResponse(shopping_list, content_type="text/plain")
-        response["Content-Disposition"] = f"attachment; {file_name}"
         return response
 
+    """
+    Что приготовить: рецепты с указанными ингредиентами
+    (?ingredients=1&ingredients=2) по убыванию доли имеющихся;
+    ?max_missing= - сколько ингредиентов может не хватать
+    """
+    @action(
+        methods=['GET'],
+        detail=False,
+        pagination_class=CustomPagination
+    )
+    def what_to_cook(self, request):
+        query = CookingQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ingredients = set(query.validated_data['ingredients'])
+        recipe_ids, matched, required = cooking_index.rank(
+            ingredients, query.validated_data.get('max_missing')
+        )
+        page = self.paginate_queryset(range(len(recipe_ids)))
+        recipes = self.get_queryset().in_bulk(recipe_ids[page].tolist())
+        results = []
+        for position in page:
+            recipe = recipes.get(int(recipe_ids[position]))
+            if recipe is None:
+                continue
+            recipe.matched_count = int(matched[position])
+            recipe.required_count = int(required[position])
+            results.append(recipe)
+        serializer = RecipeCoverageSerializer(
+            results,
+            many=True,
+            context={**self.get_serializer_context(),
+                     'ingredients': ingredients}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    """
+    Лента рекомендаций: рецепты, которые сохраняют вместе с рецептами
+    пользователя, затем популярные. Рецепты из избранного и списка
+    покупок и собственные рецепты пропускаются.
+    """
+    @action(
+        methods=['GET'],
+        detail=False,
+        pagination_class=CustomPagination
+    )
+    def recommended(self, request):
+        exclude = set()
+        if request.user.is_authenticated:
+            overlay = get_viewer_overlay(request.user)
+            exclude = overlay['favorited'] | overlay['in_shopping_cart']
+        page = self.paginate_queryset(
+            get_feed_recipe_ids(request.user, exclude)
+        )
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id in page
+             if recipe_id in recipes],
+            many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
+    """
+    Похожие рецепты из заранее рассчитанных списков
+    (команда build_similar_recipes и пересчёт при сохранении рецепта)
+    """
+    @action(methods=['GET'], detail=True, pagination_class=None)
+    def similar(self, request, pk):
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk
+        ).order_by(
+            '-similar_to__score', 'id'
+        )[:get_similarity_settings()['TOP_K']]
+        serializer = RecipeFromTheAuthor(recipes, many=True,
+                                         context={'request': request})
+        if not serializer.data and not Recipe.objects.filter(pk=pk).exists():
+            raise NotFound
+        return Response(serializer.data)
+
 
 class ShoppingCartViewSet(CreateDestroyObjView):
     """
@@ -115,12 +268,11 @@ class ShoppingCartViewSet(CreateDestroyObjView):
             user=self.request.user
         )
 
+    @transaction.atomic
     def create(self, request, recipe_id):
+        # итоги списка покупок меняются сигналом в той же транзакции
         return super().create(request, recipe_id)
 
-    def destroy(self, request, recipe_id):
-        return super().destroy(request, recipe_id)
-
 
 class FavoriteRecipesViewSet(CreateDestroyObjView):
     """
@@ -0,0 +1,287 @@
+import csv
+import json
+import os
+import struct
+import zlib
+from abc import ABCMeta, abstractmethod
+from io import BytesIO
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from PIL import ImageFont
+from rest_framework.renderers import BaseRenderer
+
+from .shopping_cart import create_shopping_cart
+
+
+class ShoppingCartRenderer(BaseRenderer, metaclass=ABCMeta):
+    """
+    Базовый рендерер списка покупок.
+    stream() получает агрегированные строки и отдаёт файл по частям.
+    """
+    charset = 'utf-8'
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    @abstractmethod
+    def stream(self, totals: Iterable[dict]) -> Iterator:
+        """
+        Файл по частям (str или bytes) из агрегированных строк
+        """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                response['Content-Type'] = 'application/json; charset=utf-8'
+            return json.dumps(data, ensure_ascii=False).encode()
+        return b''.join(
+            chunk if isinstance(chunk, bytes) else chunk.encode()
+            for chunk in self.stream(data)
+        )
+
+
+class TextShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, totals):
+        return create_shopping_cart(totals)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def stream(self, totals):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.header)
+        for item in totals:
+            yield writer.writerow((item['ingredient__name'],
+                                   item['ingredient__measurement_unit'],
+                                   item['total_amount']))
+
+
+class JSONShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, totals):
+        separator = ''
+        yield '['
+        for item in totals:
+            yield separator + json.dumps({
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['total_amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
+
+
+class PDFShoppingCartRenderer(ShoppingCartRenderer):
+    """
+    PDF без сторонних библиотек. В файл встраивается TrueType-шрифт
+    DejaVu Sans (латиница и кириллица): в стандартной Helvetica
+    кириллицы нет. Кириллические буквы кодируются байтами от 128
+    через /Differences с именами глифов из Adobe Glyph List.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_path = os.path.join(settings.BASE_DIR, 'data', 'fonts',
+                             'DejaVuSans.ttf')
+    font_name = 'DejaVuSans'
+    font_size = 12
+    leading = 16
+    lines_per_page = 48
+    page_size = (595, 842)
+    margin = 50
+    upper = 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+    lower = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+    first_code = 128
+    _font = None
+
+    def __init__(self):
+        letters = self.upper + self.lower
+        self.codes = {
+            letter: self.first_code + index
+            for index, letter in enumerate(letters)
+        }
+        self.glyphs = ' '.join(
+            [f'/afii{10017 + index}' for index in range(len(self.upper))]
+            + [f'/afii{10065 + index}' for index in range(len(self.lower))]
+        )
+
+    def _chars(self):
+        chars = {code: chr(code) for code in range(32, 127)}
+        chars.update((code, letter) for letter, code in self.codes.items())
+        return chars
+
+    def _load_font(self):
+        """
+        Сжатый файл шрифта и метрики в единицах 1/1000 кегля
+        """
+        with open(self.font_path, 'rb') as file:
+            data = file.read()
+        tables = {}
+        for index in range(struct.unpack_from('>H', data, 4)[0]):
+            tag, _, offset, _ = struct.unpack_from('>4sIII', data,
+                                                   12 + 16 * index)
+            tables[tag] = offset
+        units = struct.unpack_from('>H', data, tables[b'head'] + 18)[0]
+        bbox = struct.unpack_from('>4h', data, tables[b'head'] + 36)
+        ascent, descent = struct.unpack_from('>2h', data,
+                                             tables[b'hhea'] + 4)
+        font = ImageFont.truetype(BytesIO(data), units)
+        chars = self._chars()
+        return {
+            'file': zlib.compress(data),
+            'length': len(data),
+            'bbox': [round(value * 1000 / units) for value in bbox],
+            'ascent': round(ascent * 1000 / units),
+            'descent': round(descent * 1000 / units),
+            'last_code': max(chars),
+            'widths': [
+                round(font.getlength(chars[code]) * 1000 / units)
+                if code in chars else 0
+                for code in range(32, max(chars) + 1)
+            ],
+        }
+
+    def get_font(self):
+        if PDFShoppingCartRenderer._font is None:
+            PDFShoppingCartRenderer._font = self._load_font()
+        return PDFShoppingCartRenderer._font
+
+    def _encode(self, text):
+        result = bytearray()
+        for char in text:
+            if char in self.codes:
+                result.append(self.codes[char])
+            elif 32 <= ord(char) < 127:
+                if char in '\\()':
+                    result.append(ord('\\'))
+                result.append(ord(char))
+            else:
+                result.append(ord('?'))
+        return bytes(result)
+
+    def _lines(self, totals):
+        yield 'Список покупок:'
+        yield ''
+        for item in totals:
+            yield (f'{item["ingredient__name"]}'
+                   f'({item["ingredient__measurement_unit"]}) - '
+                   f'{item["total_amount"]}').capitalize()
+        yield ''
+        yield 'Приятных покупок'
+
+    def _pages(self, totals):
+        page = []
+        for line in self._lines(totals):
+            page.append(line)
+            if len(page) == self.lines_per_page:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _content(self, lines):
+        top = self.page_size[1] - self.margin
+        content = [
+            f'BT /F1 {self.font_size} Tf {self.leading} TL '
+            f'{self.margin} {top} Td'.encode()
+        ]
+        for line in lines:
+            content.append(b'(' + self._encode(line) + b') Tj T*')
+        content.append(b'ET')
+        return b'\n'.join(content)
+
+    def _font_objects(self):
+        font = self.get_font()
+        widths = ' '.join(map(str, font['widths']))
+        bbox = ' '.join(map(str, font['bbox']))
+        return (
+            (3, f'<< /Type /Font /Subtype /TrueType '
+                f'/BaseFont /{self.font_name} /FirstChar 32 '
+                f'/LastChar {font["last_code"]} /Widths [{widths}] '
+                f'/FontDescriptor 5 0 R /Encoding 4 0 R >>'.encode()),
+            (4, f'<< /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+                f'/Differences [{self.first_code} {self.glyphs}] >>'.encode()),
+            (5, f'<< /Type /FontDescriptor /FontName /{self.font_name} '
+                f'/Flags 32 /FontBBox [{bbox}] /ItalicAngle 0 '
+                f'/Ascent {font["ascent"]} /Descent {font["descent"]} '
+                f'/CapHeight {font["ascent"]} /StemV 80 '
+                f'/FontFile2 6 0 R >>'.encode()),
+            (6, b'<< /Length %d /Length1 %d /Filter /FlateDecode >>\n'
+                b'stream\n' % (len(font['file']), font['length'])
+                + font['file'] + b'\nendstream'),
+        )
+
+    def stream(self, totals):
+        offsets = {}
+        position = 0
+
+        def write_object(number, body):
+            nonlocal position
+            offsets[number] = position
+            chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+            position += len(chunk)
+            return chunk
+
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        position += len(header)
+        yield header
+        yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        for number, body in self._font_objects():
+            yield write_object(number, body)
+        kids = []
+        number = 7
+        width, height = self.page_size
+        for lines in self._pages(totals):
+            content = self._content(lines)
+            yield write_object(
+                number,
+                b'<< /Length %d >>\nstream\n' % len(content)
+                + content + b'\nendstream'
+            )
+            yield write_object(
+                number + 1,
+                f'<< /Type /Page /Parent 2 0 R '
+                f'/MediaBox [0 0 {width} {height}] '
+                f'/Resources << /Font << /F1 3 0 R >> >> '
+                f'/Contents {number} 0 R >>'.encode()
+            )
+            kids.append(f'{number + 1} 0 R')
+            number += 2
+        yield write_object(
+            2,
+            f'<< /Type /Pages /Kids [{" ".join(kids)}] '
+            f'/Count {len(kids)} >>'.encode()
+        )
+        xref = [b'xref\n0 %d\n' % number, b'0000000000 65535 f \n']
+        xref.extend(
+            b'%010d 00000 n \n' % offsets[obj] for obj in range(1, number)
+        )
+        yield b''.join(xref)
+        yield (b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+               % (number, position))
+
+
+SHOPPING_CART_RENDERERS = (
+    TextShoppingCartRenderer,
+    CSVShoppingCartRenderer,
+    JSONShoppingCartRenderer,
+    PDFShoppingCartRenderer,
+)
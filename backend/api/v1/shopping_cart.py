@@ -1,21 +1,167 @@
-from typing import List
+from collections import Counter
+from typing import Dict, Iterable, Iterator
 
-from recipes.models import IngredientInRecipe
+from django.db import connection, transaction
+from django.db.models import F, QuerySet, Sum
+from django.db.models.functions import Greatest
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingCartTotal
 
+TOTALS_TABLE = ShoppingCartTotal._meta.db_table
+UPSERT_SQL = (
+    f'INSERT INTO {TOTALS_TABLE} (user_id, ingredient_id, amount) '
+    f'VALUES (%s, %s, %s) ON CONFLICT (user_id, ingredient_id) '
+    f'DO UPDATE SET amount = {TOTALS_TABLE}.amount + EXCLUDED.amount'
+)
 
-def create_shopping_cart(lst: List[IngredientInRecipe]) -> str:
+
+def get_recipe_amounts(recipe_id) -> Dict[int, int]:
+    """
+    Количество каждого ингредиента в рецепте
+    """
+    return dict(
+        IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def compute_shopping_cart_totals(user_ids=None) -> Dict[tuple, int]:
+    """
+    Итоги списков покупок, посчитанные заново по рецептам в корзине
+    """
+    if user_ids is None:
+        rows = IngredientInRecipe.objects.filter(
+            recipe__shopping_cart__isnull=False
+        )
+    else:
+        rows = IngredientInRecipe.objects.filter(
+            recipe__shopping_cart__user__in=user_ids
+        )
+    rows = rows.values_list(
+        'recipe__shopping_cart__user', 'ingredient'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by()
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in rows.iterator()
+    }
+
+
+def apply_shopping_cart_delta(user_ids, delta: Dict[int, int]) -> None:
+    """
+    Прибавление (или вычитание) количеств к итогам списков покупок.
+    Прибавка вставляет строку или увеличивает существующую одним
+    INSERT ... ON CONFLICT, поэтому параллельные добавления одного
+    ингредиента не конфликтуют; вычитание меняет только существующие
+    строки, обнулённые удаляются.
+    """
+    user_ids = sorted(user_ids)
+    added = sorted(
+        (ingredient_id, amount)
+        for ingredient_id, amount in delta.items() if amount > 0
+    )
+    removed = {
+        ingredient_id: amount
+        for ingredient_id, amount in delta.items() if amount < 0
+    }
+    if not user_ids or not (added or removed):
+        return
+    with transaction.atomic():
+        if added:
+            with connection.cursor() as cursor:
+                cursor.executemany(UPSERT_SQL, [
+                    (user_id, ingredient_id, amount)
+                    for user_id in user_ids
+                    for ingredient_id, amount in added
+                ])
+        if not removed:
+            return
+        totals = ShoppingCartTotal.objects.filter(user_id__in=user_ids)
+        by_amount = {}
+        for ingredient_id, amount in removed.items():
+            by_amount.setdefault(amount, []).append(ingredient_id)
+        for amount, ingredient_ids in by_amount.items():
+            totals.filter(ingredient_id__in=ingredient_ids).update(
+                amount=Greatest(F('amount') + amount, 0)
+            )
+        totals.filter(ingredient_id__in=removed, amount=0).delete()
+
+
+def add_recipe_to_totals(user_id, recipe_id) -> None:
+    apply_shopping_cart_delta((user_id, ), get_recipe_amounts(recipe_id))
+
+
+def remove_recipe_from_totals(user_id, recipe_id) -> None:
+    apply_shopping_cart_delta(
+        (user_id, ),
+        {ingredient_id: -amount for ingredient_id, amount
+         in get_recipe_amounts(recipe_id).items()}
+    )
+
+
+def update_recipe_in_totals(recipe_id, old_amounts: Dict[int, int],
+                            new_amounts: Dict[int, int]) -> None:
+    """
+    Перенос изменений состава рецепта в списки покупок
+    """
+    delta = Counter(new_amounts)
+    delta.subtract(old_amounts)
+    apply_shopping_cart_delta(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        delta
+    )
+
+
+def delete_recipe_from_totals(recipe_id) -> None:
+    """
+    Вычитание удаляемого рецепта из всех списков покупок
+    """
+    update_recipe_in_totals(recipe_id, get_recipe_amounts(recipe_id), {})
+
+
+def rebuild_shopping_cart_totals(user_ids=None) -> int:
+    """
+    Пересоздание итогов списков покупок
+    """
+    totals = compute_shopping_cart_totals(user_ids)
+    with transaction.atomic():
+        stored = ShoppingCartTotal.objects.all()
+        if user_ids is not None:
+            stored = stored.filter(user_id__in=user_ids)
+        stored.delete()
+        ShoppingCartTotal.objects.bulk_create(
+            ShoppingCartTotal(user_id=user_id,
+                              ingredient_id=ingredient_id,
+                              amount=amount)
+            for (user_id, ingredient_id), amount in totals.items()
+        )
+    return len(totals)
+
+
+def get_shopping_cart_totals(user) -> QuerySet:
+    """
+    Суммарное количество каждого ингредиента из списка покупок
+    """
+    return ShoppingCartTotal.objects.filter(
+        user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        total_amount=F('amount')
+    ).order_by('ingredient__name')
+
+
+def create_shopping_cart(totals: Iterable[dict]) -> Iterator[str]:
     """
-    Создание списка покупок
+    Создание списка покупок построчно
     """
-    dct = {}
-    for comp in lst:
-        if comp.ingredient not in dct:
-            dct[comp.ingredient] = comp.amount
-        else:
-            dct[comp.ingredient] = comp.amount + dct[comp.ingredient]
-    shopping_list = 'Список покупок: \n\n'
-    for key, value in dct.items():
-        str_line = f'{key}({key.measurement_unit}) - {value},'.capitalize()
-        shopping_list += str_line + '\n'
-    shopping_list += '\nПриятных покупок'
-    return shopping_list
+    yield 'Список покупок: \n\n'
+    for item in totals:
+        str_line = (f'{item["ingredient__name"]}'
+                    f'({item["ingredient__measurement_unit"]}) - '
+                    f'{item["total_amount"]},').capitalize()
+        yield str_line + '\n'
+    yield '\nПриятных покупок'
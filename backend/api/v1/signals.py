@@ -0,0 +1,93 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart)
+from users.models import Subscription
+
+from .flags import invalidate_viewer_overlay
+from .shopping_cart import (add_recipe_to_totals, delete_recipe_from_totals,
+                            remove_recipe_from_totals, update_recipe_in_totals)
+
+User = get_user_model()
+
+
+def _deleted_with(origin, *models):
+    """
+    Удаление вызвано удалением объекта или queryset'а одной из моделей
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_cart_totals(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_recipe_to_totals(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_cart_totals(instance, origin=None, **kwargs):
+    # итоги удаляемого пользователя удаляются каскадом,
+    # а удаляемый рецепт вычитается из всех списков сразу
+    if _deleted_with(origin, Recipe, User):
+        return
+    remove_recipe_from_totals(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_cart_totals(instance, **kwargs):
+    delete_recipe_from_totals(instance.id)
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_stored_component(instance, raw=False, **kwargs):
+    instance._stored_component = None
+    if instance.pk is not None and not raw:
+        instance._stored_component = IngredientInRecipe.objects.filter(
+            pk=instance.pk
+        ).values_list('recipe_id', 'ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def update_component_in_totals(instance, raw=False, **kwargs):
+    """
+    Изменение строки состава по одной (админка); массовые
+    bulk_create/bulk_update сами переносят изменения в итоги
+    """
+    if raw:
+        return
+    old_amounts = {}
+    stored = getattr(instance, '_stored_component', None)
+    if stored is not None:
+        recipe_id, ingredient_id, amount = stored
+        if recipe_id == instance.recipe_id:
+            old_amounts = {ingredient_id: amount}
+        else:
+            update_recipe_in_totals(recipe_id, {ingredient_id: amount}, {})
+    update_recipe_in_totals(instance.recipe_id, old_amounts,
+                            {instance.ingredient_id: instance.amount})
+
+
+@receiver(pre_delete, sender=IngredientInRecipe)
+def remove_component_from_totals(instance, origin=None, **kwargs):
+    # удаляемый рецепт вычитается целиком, а итоги удаляемого
+    # ингредиента удаляются каскадом
+    if _deleted_with(origin, Recipe, Ingredient):
+        return
+    update_recipe_in_totals(instance.recipe_id,
+                            {instance.ingredient_id: instance.amount}, {})
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_viewer_flags(instance, **kwargs):
+    transaction.on_commit(
+        partial(invalidate_viewer_overlay, instance.user_id)
+    )
@@ -1,12 +1,18 @@
 from django.contrib.auth import get_user_model, hashers
+from django.db.models import (Count, F, Manager, OuterRef, Prefetch, Subquery,
+                              Window)
+from django.db.models.functions import Coalesce, RowNumber
 from recipes.models import Recipe
 from rest_framework import serializers
 from users.models import Subscription
 
+from .flags import get_viewer_flags
+
 User = get_user_model()
 
 INVALID_USERNAMES = ['me', 'admin', 'user', 'username']
 VALID_TEXT = 'Логин не может быть одним из: {}, {}, {}, {}'
+AUTHOR_RECIPES_ATTR = 'author_recipes'
 
 
 class UserAfterRegisterSerializer(serializers.ModelSerializer):
@@ -57,6 +63,16 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+class UserListSerializer(serializers.ListSerializer):
+    """
+    Список пользователей: подписки загружаются на всю страницу сразу
+    """
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, Manager) else data)
+        get_viewer_flags(self.context).prime_users(users)
+        return super().to_representation(users)
+
+
 class UserReadSerializer(serializers.ModelSerializer):
     """
     Просмотр пользователя
@@ -67,39 +83,109 @@ class UserReadSerializer(serializers.ModelSerializer):
         model = User
         fields = ('email', 'id', 'first_name',
                   'last_name', 'username', 'is_subscribed')
+        list_serializer_class = UserListSerializer
 
     def get_subscribed(self, obj):
-        if self.context['request'].user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            user=self.context['request'].user,
-            author=obj
-        ).exists()
+        annotated = getattr(obj, 'is_subscribed', None)
+        if annotated is not None:
+            return annotated
+        return get_viewer_flags(self.context).has('subscribed', obj.id)
+
+
+class ImageRenditionField(serializers.ImageField):
+    """
+    Ссылка на уменьшенную копию фото рецепта; пока копии нет - на оригинал.
+    """
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        image = getattr(recipe, f'image_{self.rendition}') or recipe.image
+        return super().to_representation(image)
 
 
 class RecipeFromTheAuthor(serializers.ModelSerializer):
     """
     Список рецептов от данного автора
     """
+    image = ImageRenditionField('card')
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+def get_recipes_limit(request):
+    """
+    Ограничение числа рецептов автора из параметра recipes_limit
+    """
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def with_author_recipes(queryset, recipes_limit=None):
+    """
+    Авторы с числом рецептов и не более recipes_limit последними
+    рецептами каждого, загруженными одним запросом
+    """
+    recipes = Recipe.objects.all()
+    if recipes_limit is not None:
+        recipes = recipes.annotate(
+            author_row=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=('-pub_date', '-id')
+            )
+        ).filter(author_row__lte=recipes_limit)
+    return queryset.annotate(
+        recipes_count=Coalesce(
+            Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('pk')
+                ).order_by().values('author').annotate(
+                    count=Count('id')
+                ).values('count')
+            ),
+            0
+        )
+    ).prefetch_related(
+        Prefetch('recipes', queryset=recipes, to_attr=AUTHOR_RECIPES_ATTR)
+    )
+
+
 class AuthorOfRecipesSerializer(UserReadSerializer):
     """
     Авторы, на которых подписан пользователь
     """
-    recipes = RecipeFromTheAuthor(many=True)
+    recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ('email', 'id', 'first_name', 'last_name',
                   'username', 'is_subscribed', 'recipes', 'recipes_count')
+        list_serializer_class = UserListSerializer
+
+    def get_recipes(self, obj):
+        recipes = getattr(obj, AUTHOR_RECIPES_ATTR, None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            limit = get_recipes_limit(self.context['request'])
+            if limit is not None:
+                recipes = recipes[:limit]
+        return RecipeFromTheAuthor(recipes, many=True,
+                                   context=self.context).data
 
     def get_recipes_count(self, obj):
+        annotated = getattr(obj, 'recipes_count', None)
+        if annotated is not None:
+            return annotated
         return obj.recipes.count()
 
 
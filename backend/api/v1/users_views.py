@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Value
+from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import permissions
 from rest_framework.decorators import action
@@ -7,7 +9,8 @@ from users.models import Subscription
 from .mixins import CreateDestroyObjView
 from .paginations import CustomPagination
 from .users_serializers import (AuthorOfRecipesSerializer,
-                                SubscriptionSerializer)
+                                SubscriptionSerializer, get_recipes_limit,
+                                with_author_recipes)
 
 User = get_user_model()
 
@@ -31,8 +34,11 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(
-            subscribe__user=user
+        queryset = with_author_recipes(
+            User.objects.filter(subscribe__user=user),
+            get_recipes_limit(request)
+        ).annotate(
+            is_subscribed=Value(True)
         ).order_by('username')
         set_in_pages = self.paginate_queryset(queryset=queryset)
         serializer = AuthorOfRecipesSerializer(set_in_pages,
@@ -53,6 +59,16 @@ class CreateDestroySubscribeViewSet(CreateDestroyObjView):
     def get_queryset(self):
         return self.request.user.subscriber
 
+    def _get_obj(self, obj_id):
+        # рецепты автора нужны только в ответе на подписку
+        if self.action != 'create':
+            return super()._get_obj(obj_id)
+        return get_object_or_404(
+            with_author_recipes(User.objects.all(),
+                                get_recipes_limit(self.request)),
+            pk=obj_id
+        )
+
     def create(self, request, user_id):
         return super().create(request, user_id)
 
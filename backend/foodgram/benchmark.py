@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+from urllib.error import URLError
+
+from django.conf import settings
+from django.core.management import CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Отдельная тестовая БД (test_<имя>) и кеши в памяти на время замера:
+    синтетические данные не попадают в рабочую базу и её кеши
+    """
+    with override_settings(CACHES={
+        'default': {'BACKEND': LOCMEM, 'LOCATION': 'benchmark'},
+        'state': {'BACKEND': LOCMEM, 'LOCATION': 'benchmark_state'},
+    }):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func, *args, repeat=1):
+    """
+    Среднее время вызова в миллисекундах и результат последнего вызова
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+@contextmanager
+def serve(application, port, workers=2, worker_class=None, **env):
+    """
+    gunicorn с приложением application на тестовой БД и кешах в памяти
+    процессов; env - дополнительные переменные окружения.
+    Возвращает адрес сервера.
+    """
+    database = connection.settings_dict
+    if connection.creation.is_in_memory_db(database['NAME']):
+        raise CommandError('Серверам нужна тестовая БД не в памяти')
+    environ = dict(os.environ, DB_ENGINE=database['ENGINE'],
+                   DB_NAME=str(database['NAME']), CACHE_BACKEND=LOCMEM,
+                   STATE_CACHE_BACKEND=LOCMEM)
+    environ.update(env)
+    command = [
+        os.path.join(os.path.dirname(sys.executable), 'gunicorn'),
+        application, '--workers', str(workers),
+        '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+    ]
+    if worker_class:
+        command += ['-k', worker_class]
+    url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=environ)
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f'{url}/api/tags/').read()
+                break
+            except URLError:
+                time.sleep(0.1)
+        else:
+            raise CommandError(f'{application} не запустился')
+        yield url
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,76 @@
+import time
+from threading import Lock
+
+from django.core.cache import cache, caches
+from django.utils.connection import ConnectionProxy
+
+STATE_CACHE_ALIAS = 'state'
+
+# Общие для всех процессов служебные значения, которые нельзя терять
+# при вытеснении: версии данных и отметки об отзыве токенов
+state_cache = ConnectionProxy(caches, STATE_CACHE_ALIAS)
+
+
+def increment(key, delta=1, initial=0, target=cache):
+    """
+    Увеличение бессрочного счётчика в кеше target. Отсутствующий
+    счётчик создаётся со значением initial; если ключ вытеснен между
+    add и incr, он записывается заново.
+    """
+    target.add(key, initial, timeout=None)
+    try:
+        return target.incr(key, delta)
+    except ValueError:
+        target.set(key, initial + delta, timeout=None)
+        return initial + delta
+
+
+class BufferedCounters:
+    """
+    Счётчики событий, которые копятся в процессе и сбрасываются в общий
+    кеш пачками: после flush_every событий или через flush_interval
+    секунд, чтобы не писать в кеш на каждый запрос.
+    keys - ключи счётчиков в кеше по названиям событий.
+    """
+
+    def __init__(self, keys, flush_every=100, flush_interval=10):
+        self.keys = keys
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        self._counts = dict.fromkeys(keys, 0)
+        self._flushed_at = time.monotonic()
+
+    def _take(self):
+        counts, self._counts = self._counts, dict.fromkeys(self.keys, 0)
+        self._flushed_at = time.monotonic()
+        return counts
+
+    def _write(self, counts):
+        for event, value in counts.items():
+            if value:
+                increment(self.keys[event], value)
+
+    def count(self, event):
+        with self._lock:
+            self._counts[event] += 1
+            if (sum(self._counts.values()) < self.flush_every
+                    and time.monotonic() - self._flushed_at
+                    < self.flush_interval):
+                return
+            counts = self._take()
+        self._write(counts)
+
+    def flush(self):
+        with self._lock:
+            counts = self._take()
+        self._write(counts)
+
+    def get(self):
+        """
+        Значения, уже сброшенные в кеш всеми процессами
+        """
+        return {event: cache.get(key, 0) for event, key in self.keys.items()}
+
+    def reset(self):
+        cache.delete_many(self.keys.values())
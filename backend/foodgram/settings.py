@@ -30,7 +30,8 @@ INSTALLED_APPS = [
     'colorfield',
     'recipes',
     'users',
-    'api'
+    'api',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -70,6 +71,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+TEST_RUNNER = 'foodgram.test_runner.LocMemCacheRunner'
+
+INGREDIENT_INDEX = os.getenv('INGREDIENT_INDEX', default='True') == 'True'
+
 
 DATABASES = {
     'default': {
@@ -78,10 +83,35 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='password'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True'
+        ) == 'True',
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_PGBOUNCER', default='False'
+        ) == 'True',
     }
 }
 
+STATE_CACHE_BACKEND = os.getenv('STATE_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='/var/tmp/foodgram_cache'),
+    },
+    # версии данных и отзывы токенов: без вытеснения по MAX_ENTRIES,
+    # внешний кеш для этого псевдонима не должен вытеснять ключи
+    'state': {
+        'BACKEND': STATE_CACHE_BACKEND,
+        'LOCATION': os.getenv('STATE_CACHE_LOCATION', default='/var/tmp/foodgram_state'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10 ** 9,
+        } if STATE_CACHE_BACKEND.endswith('FileBasedCache') else {},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,7 +132,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'users.authentication.CachedTokenAuthentication'
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
@@ -111,6 +141,11 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+TOKEN_CACHE = {
+    'MAX_SIZE': 10_000,
+    'TIMEOUT': int(os.getenv('TOKEN_CACHE_TIMEOUT', default=300)),
+}
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -143,4 +178,39 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+RECIPE_IMAGES = {
+    'MAX_UPLOAD_SIZE': int(os.getenv('RECIPE_IMAGE_MAX_SIZE',
+                                     default=5 * 1024 * 1024)),
+    'MAX_SIDE': 8000,
+    'MAX_PIXELS': 40_000_000,
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+    'ORIGINAL_SIDE': 2048,
+    'RENDITIONS': {
+        'detail': 1200,
+        'card': 480,
+    },
+}
+
+SIMILAR_RECIPES = {
+    'TOP_K': 10,
+    'MAX_DF': 0.1,
+    'MAX_DF_FLOOR': 1000,
+    'MAX_CANDIDATES': 2000,
+    'TAG_WEIGHT': 0.5,
+    'BLOCK_SIZE': 2_000_000,
+}
+
+RECOMMENDATIONS = {
+    'FAVORITE_WEIGHT': 1.0,
+    'SHOPPING_CART_WEIGHT': 0.5,
+    'SUBSCRIPTION_BOOST': 0.5,
+    'MAX_USER_ITEMS': 200,
+    'ITEM_NEIGHBORS': 50,
+    'PER_USER': 100,
+    'POPULAR': 500,
+    'REFRESH_DELAY': 60,
+    'BLOCK_SIZE': 2_000_000,
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
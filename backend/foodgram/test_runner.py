@@ -0,0 +1,23 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+class LocMemCacheRunner(DiscoverRunner):
+    """
+    Тесты работают с кешами в памяти процесса вместо файловых кешей
+    из настроек
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches = override_settings(CACHES={
+            'default': {'BACKEND': LOCMEM, 'LOCATION': 'test'},
+            'state': {'BACKEND': LOCMEM, 'LOCATION': 'test_state'},
+        })
+        self.caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.disable()
+        super().teardown_test_environment(**kwargs)
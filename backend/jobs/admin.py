@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Модель фоновой задачи
+    """
+    list_display = ['name', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ('status', 'name')
+    search_fields = ('key', )
+    readonly_fields = ['created_at', 'locked_at', 'last_error']
+    actions = ['retry']
+
+    @admin.action(description='Перезапустить')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING,
+            attempts=0,
+            run_after=timezone.now()
+        )
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+from jobs.queue import claim_job, fail_stale_jobs, purge_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when there are no jobs ready to run'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--maintenance-interval',
+            type=float,
+            default=600.0,
+            help='Seconds between failing stale jobs and purging old ones'
+        )
+
+    def maintain(self):
+        failed = fail_stale_jobs()
+        purged = purge_jobs()
+        if failed or purged:
+            self.stdout.write(
+                f'Очередь: зависших задач {failed}, удалено {purged}'
+            )
+
+    def handle(self, *args, **options):
+        maintained_at = None
+        while True:
+            close_old_connections()
+            if (maintained_at is None or time.monotonic() - maintained_at
+                    >= options['maintenance_interval']):
+                self.maintain()
+                maintained_at = time.monotonic()
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            if run_job(job):
+                self.stdout.write(f'{job.name} #{job.id}: выполнена')
+            else:
+                self.stderr.write(
+                    f'{job.name} #{job.id}: ошибка, попытка {job.attempts}'
+                )
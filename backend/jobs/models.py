@@ -0,0 +1,56 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=150, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    key = models.CharField(max_length=255,
+                           unique=True,
+                           null=True,
+                           blank=True,
+                           verbose_name='Ключ идемпотентности')
+    status = models.CharField(max_length=10,
+                              choices=STATUSES,
+                              default=PENDING,
+                              verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='Попыток')
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name='Максимум попыток'
+    )
+    run_after = models.DateTimeField(default=timezone.now,
+                                     verbose_name='Запуск не раньше')
+    locked_at = models.DateTimeField(null=True,
+                                     blank=True,
+                                     verbose_name='Взята в работу')
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Создана')
+
+    class Meta:
+        ordering = ('run_after', 'id')
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_after'],
+                         name='job_status_run_after_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
@@ -0,0 +1,134 @@
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+RETRY_DELAY = timedelta(seconds=10)
+LOCK_TIMEOUT = timedelta(minutes=10)
+DONE_RETENTION = timedelta(days=1)
+FAILED_RETENTION = timedelta(days=30)
+PURGE_BATCH_SIZE = 1000
+
+TASKS = {}
+
+
+def task(max_attempts=5):
+    """
+    Регистрация функции как фоновой задачи.
+    Параметры задачи должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        TASKS[func.task_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, payload=None, key=None, delay=None):
+    """
+    Постановка задачи в очередь. Запись создаётся в текущей транзакции,
+    поэтому воркер увидит задачу только после её фиксации.
+    Задача с уже известным ключом повторно не ставится.
+    """
+    values = {
+        'name': func.task_name,
+        'payload': payload or {},
+        'max_attempts': func.max_attempts,
+        'run_after': timezone.now() + (delay or timedelta()),
+    }
+    if key is None:
+        return Job.objects.create(**values)
+    job, _ = Job.objects.get_or_create(key=key, defaults=values)
+    return job
+
+
+def claim_job():
+    """
+    Выбор готовой к запуску задачи. Зависшие дольше LOCK_TIMEOUT
+    задачи считаются брошенными и берутся повторно.
+    """
+    now = timezone.now()
+    ready = (
+        Q(status=Job.PENDING, run_after__lte=now)
+        | Q(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT,
+            attempts__lt=F('max_attempts'))
+    )
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            ready
+        ).order_by('run_after', 'id').first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(
+            pk=job.pk,
+            status=job.status,
+            attempts=job.attempts
+        ).update(status=Job.RUNNING, locked_at=now,
+                 attempts=F('attempts') + 1)
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    """
+    Выполнение задачи в транзакции. При ошибке задача возвращается
+    в очередь с растущей задержкой, пока не исчерпаны попытки.
+    """
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована')
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        retry = job.attempts < job.max_attempts
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.PENDING if retry else Job.FAILED,
+            run_after=timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1),
+            locked_at=None,
+            last_error=traceback.format_exc()
+        )
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, locked_at=None)
+    return True
+
+
+def fail_stale_jobs():
+    """
+    Зависшие дольше LOCK_TIMEOUT задачи без оставшихся попыток
+    повторно не берутся и помечаются ошибочными
+    """
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - LOCK_TIMEOUT,
+        attempts__gte=F('max_attempts')
+    ).update(status=Job.FAILED, locked_at=None,
+             last_error='Превышено время выполнения')
+
+
+def purge_jobs():
+    """
+    Удаление выполненных задач старше DONE_RETENTION и ошибочных старше
+    FAILED_RETENTION пачками по PURGE_BATCH_SIZE. Ключи задач содержат
+    время, поэтому удаление не приводит к повторной постановке.
+    """
+    now = timezone.now()
+    expired = (
+        Q(status=Job.DONE, run_after__lt=now - DONE_RETENTION)
+        | Q(status=Job.FAILED, run_after__lt=now - FAILED_RETENTION)
+    )
+    deleted = 0
+    while True:
+        ids = list(Job.objects.filter(expired).values_list(
+            'id', flat=True
+        )[:PURGE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(pk__in=ids).delete()[0]
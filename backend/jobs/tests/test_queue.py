@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import (DONE_RETENTION, FAILED_RETENTION, LOCK_TIMEOUT,
+                        claim_job, fail_stale_jobs, purge_jobs)
+
+
+class QueueMaintenanceTest(TestCase):
+
+    def create_job(self, status, age=timedelta(), **fields):
+        return Job.objects.create(name='test', status=status,
+                                  run_after=timezone.now() - age, **fields)
+
+    def test_purge_keeps_recent_and_unfinished_jobs(self):
+        day = timedelta(days=1)
+        kept = [
+            self.create_job(Job.DONE),
+            self.create_job(Job.FAILED, DONE_RETENTION + day),
+            self.create_job(Job.PENDING, FAILED_RETENTION + day),
+        ]
+        self.create_job(Job.DONE, DONE_RETENTION + day)
+        self.create_job(Job.FAILED, FAILED_RETENTION + day)
+        self.assertEqual(purge_jobs(), 2)
+        self.assertQuerysetEqual(Job.objects.order_by('id'), kept)
+
+    def test_stale_job_without_attempts_fails(self):
+        locked_at = timezone.now() - LOCK_TIMEOUT - timedelta(minutes=1)
+        exhausted = self.create_job(Job.RUNNING, locked_at=locked_at,
+                                    attempts=5, max_attempts=5)
+        retried = self.create_job(Job.RUNNING, locked_at=locked_at,
+                                  attempts=1, max_attempts=5)
+        self.assertEqual(fail_stale_jobs(), 1)
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, Job.FAILED)
+        self.assertIsNone(exhausted.locked_at)
+        self.assertEqual(claim_job(), retried)
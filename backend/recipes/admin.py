@@ -1,7 +1,11 @@
+from django import forms
 from django.contrib import admin
 
+from .images import open_image
 from .models import (FavoriteRecipe, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingCartTotal, SimilarRecipe, Tag,
+                     UserRecommendations)
+from .tasks import reset_recipe_image, schedule_recipe_image
 
 
 class AlphabetListFilter(admin.SimpleListFilter):
@@ -43,16 +47,41 @@ class TagInline(admin.TabularInline):
     extra = 1
 
 
+class RecipeAdminForm(forms.ModelForm):
+    """
+    Форма рецепта: новое фото проверяется так же, как в API
+    """
+
+    class Meta:
+        model = Recipe
+        fields = '__all__'
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if 'image' in self.changed_data and image:
+            open_image(image)
+        return image
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """
     Модель Рецепта
     """
+    form = RecipeAdminForm
     list_display = ['name', 'author', 'is_favorited']
     list_filter = ('name', 'author', 'tags')
     exclude = ('tags', )
     inlines = [TagInline]
-    readonly_fields = ['is_favorited', ]
+    readonly_fields = ['is_favorited', 'image_status']
+
+    def save_model(self, request, obj, form, change):
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            reset_recipe_image(obj)
+        super().save_model(request, obj, form, change)
+        if image_changed:
+            schedule_recipe_image(obj)
 
     @admin.display(description='Кол-во добавлений в избранное')
     def is_favorited(self, obj):
@@ -94,3 +123,31 @@ class ShoppingAdmin(admin.ModelAdmin):
     Список покупок
     """
     list_display = ['recipe', 'user']
+
+
+@admin.register(ShoppingCartTotal)
+class ShoppingTotalAdmin(admin.ModelAdmin):
+    """
+    Итоги списков покупок
+    """
+    list_display = ['user', 'ingredient', 'amount']
+    list_filter = ('user', )
+
+
+@admin.register(SimilarRecipe)
+class SimilarRecipeAdmin(admin.ModelAdmin):
+    """
+    Похожие рецепты
+    """
+    list_display = ['recipe', 'similar', 'score']
+    raw_id_fields = ('recipe', 'similar')
+
+
+@admin.register(UserRecommendations)
+class UserRecommendationsAdmin(admin.ModelAdmin):
+    """
+    Рекомендации пользователям
+    """
+    list_display = ['user', 'updated_at']
+    raw_id_fields = ('user', )
+    exclude = ('recipe_ids', )
@@ -0,0 +1,115 @@
+import time
+from threading import Lock, Thread
+
+import numpy as np
+from django.db import connection
+
+from .models import IngredientInRecipe
+from .versions import RECIPES, get_version
+
+
+class CookingIndex:
+    """
+    Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+    Для каждого ингредиента хранится непрерывный отрезок номеров
+    рецептов (CSR), для каждого рецепта - число его ингредиентов.
+    Совпадения считаются одним bincount по отрезкам выбранных
+    ингредиентов, без обращения к БД.
+    Индекс перестраивается при смене версии рецептов, но не чаще
+    refresh_interval секунд, в фоновом потоке: запросы получают
+    предыдущую версию, пока новая не готова. Ждёт построения только
+    первый запрос процесса.
+    """
+    refresh_interval = 60
+
+    def __init__(self):
+        self._lock = Lock()
+        self._data = None
+
+    def _build(self, version):
+        rows = np.array(
+            IngredientInRecipe.objects.order_by(
+                'ingredient_id', 'recipe_id'
+            ).values_list('ingredient_id', 'recipe_id'),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        recipe_ids, positions = np.unique(rows[:, 1], return_inverse=True)
+        ingredient_ids, starts = np.unique(rows[:, 0], return_index=True)
+        ends = np.append(starts[1:], len(rows))
+        return {
+            'version': version,
+            'built_at': time.monotonic(),
+            'recipe_ids': recipe_ids,
+            'required': np.bincount(positions, minlength=len(recipe_ids)),
+            'postings': positions.astype(np.int32),
+            'ranges': {
+                ingredient_id: (start, end) for ingredient_id, start, end
+                in zip(ingredient_ids.tolist(), starts.tolist(),
+                       ends.tolist())
+            },
+        }
+
+    def _is_fresh(self, data, version):
+        return (data['version'] == version
+                or time.monotonic() - data['built_at'] < self.refresh_interval)
+
+    def _rebuild(self, version):
+        try:
+            self._data = self._build(version)
+        finally:
+            connection.close()
+            self._lock.release()
+
+    def _get_data(self):
+        version = get_version(RECIPES)
+        data = self._data
+        if data is not None and self._is_fresh(data, version):
+            return data
+        if not self._lock.acquire(blocking=data is None):
+            return data
+        data = self._data
+        if data is not None and self._is_fresh(data, version):
+            self._lock.release()
+            return data
+        if data is not None:
+            Thread(target=self._rebuild, args=(version, ),
+                   daemon=True).start()
+            return data
+        try:
+            data = self._data = self._build(version)
+        finally:
+            self._lock.release()
+        return data
+
+    def rank(self, ingredient_ids, max_missing=None):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов, по убыванию
+        покрытия (найдено / требуется), затем по числу найденных и id.
+        Возвращает массивы id рецептов, найденных и требуемых
+        ингредиентов.
+        """
+        data = self._get_data()
+        slices = [
+            data['postings'][slice(*data['ranges'][ingredient_id])]
+            for ingredient_id in set(ingredient_ids)
+            if ingredient_id in data['ranges']
+        ]
+        if not slices:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        matched = np.bincount(np.concatenate(slices),
+                              minlength=len(data['recipe_ids']))
+        candidates = np.flatnonzero(matched)
+        matched = matched[candidates]
+        required = data['required'][candidates]
+        if max_missing is not None:
+            allowed = required - matched <= max_missing
+            candidates = candidates[allowed]
+            matched = matched[allowed]
+            required = required[allowed]
+        recipe_ids = data['recipe_ids'][candidates]
+        order = np.lexsort((-recipe_ids, -matched, -matched / required))
+        return recipe_ids[order], matched[order], required[order]
+
+
+cooking_index = CookingIndex()
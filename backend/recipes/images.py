@@ -0,0 +1,99 @@
+from io import BytesIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+RENDITION_FIELD = 'image_{}'
+
+
+def get_image_settings():
+    return settings.RECIPE_IMAGES
+
+
+def get_rendition_fields():
+    """
+    Поля рецепта с уменьшенными копиями фото
+    """
+    return tuple(
+        RENDITION_FIELD.format(name)
+        for name in get_image_settings()['RENDITIONS']
+    )
+
+
+def open_image(file):
+    """
+    Проверка размера файла и изображения до декодирования пикселей
+    """
+    options = get_image_settings()
+    max_size = options['MAX_UPLOAD_SIZE']
+    if file.size > max_size:
+        raise ValidationError(
+            f'Размер изображения больше {max_size // 1024} КБ.'
+        )
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValidationError('Файл не является изображением.')
+    width, height = image.size
+    if (max(width, height) > options['MAX_SIDE']
+            or width * height > options['MAX_PIXELS']):
+        raise ValidationError(
+            f'Изображение {width}x{height} слишком велико, '
+            f'допустимо до {options["MAX_SIDE"]} точек по стороне.'
+        )
+    return image
+
+
+def _prepare(image):
+    """
+    Декодирование с учётом ориентации из EXIF; метаданные отбрасываются
+    """
+    side = get_image_settings()['ORIGINAL_SIDE']
+    if image.format == 'JPEG':
+        scale = side / max(image.size)
+        image.draft('RGB', (int(image.width * scale),
+                            int(image.height * scale)))
+    try:
+        image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError):
+        raise ValidationError('Изображение повреждено.')
+    mode = 'RGBA' if image.has_transparency_data else 'RGB'
+    if image.mode != mode:
+        image = image.convert(mode)
+    return image
+
+
+def _encode(image, side):
+    options = get_image_settings()
+    image.thumbnail((side, side), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, options['FORMAT'], quality=options['QUALITY'])
+    return buffer.getvalue()
+
+
+def prepare_recipe_images(file):
+    """
+    Перекодирование фото рецепта в компактный формат и уменьшенные
+    копии для карточек и страницы рецепта. Возвращает значения полей
+    рецепта. Копии строятся от большей к меньшей.
+    """
+    options = get_image_settings()
+    image = _prepare(open_image(file))
+    extension = options['FORMAT'].lower()
+    name = uuid4().hex
+    images = {
+        'image': ContentFile(_encode(image, options['ORIGINAL_SIDE']),
+                             name=f'{name}.{extension}')
+    }
+    renditions = sorted(options['RENDITIONS'].items(),
+                        key=lambda item: item[1], reverse=True)
+    for rendition, side in renditions:
+        images[RENDITION_FIELD.format(rendition)] = ContentFile(
+            _encode(image, side),
+            name=f'{name}_{rendition}.{extension}'
+        )
+    return images
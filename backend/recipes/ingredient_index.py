@@ -0,0 +1,133 @@
+from array import array
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+
+from .models import Ingredient
+from .versions import INGREDIENTS, bump_version, get_version
+
+
+class IngredientSnapshot:
+    """
+    Справочник ингредиентов одной версии.
+    Названия хранятся отсортированными (casefold) параллельно с id
+    и кодами единиц измерения; поиск по началу названия - бинарный.
+    Поиск по снимку не обращается ни к БД, ни к кешу.
+    """
+
+    def __init__(self, version, rows):
+        rows = sorted(rows, key=lambda row: (row[1].casefold(), row[0]))
+        self.version = version
+        self.folded = [row[1].casefold() for row in rows]
+        self.names = [row[1] for row in rows]
+        self.ids = array('q', (row[0] for row in rows))
+        self.units = sorted({row[2] for row in rows})
+        unit_codes = {unit: code for code, unit in enumerate(self.units)}
+        self.unit_codes = array('H', (unit_codes[row[2]] for row in rows))
+        self.positions = {row[0]: position
+                          for position, row in enumerate(rows)}
+
+    def _item(self, position):
+        return {
+            'id': self.ids[position],
+            'name': self.names[position],
+            'measurement_unit': self.units[self.unit_codes[position]],
+        }
+
+    def get(self, ingredient_id):
+        position = self.positions.get(ingredient_id)
+        if position is None:
+            return None
+        return self._item(position)
+
+    def search(self, name='', measurement_unit=None, limit=None,
+               contains_min_length=None):
+        """
+        Ингредиенты, название которых начинается с name; при длине
+        запроса от contains_min_length - также содержащие name,
+        после совпадений по началу.
+        """
+        folded = self.folded
+        prefix = name.strip().casefold()
+        unit_code = None
+        if measurement_unit is not None:
+            if measurement_unit not in self.units:
+                return []
+            unit_code = self.units.index(measurement_unit)
+
+        def matches(position):
+            return (unit_code is None
+                    or self.unit_codes[position] == unit_code)
+
+        found = []
+        position = bisect_left(folded, prefix)
+        while (position < len(folded)
+               and folded[position].startswith(prefix)
+               and (limit is None or len(found) < limit)):
+            if matches(position):
+                found.append(position)
+            position += 1
+        if (prefix and contains_min_length is not None
+                and len(prefix) >= contains_min_length):
+            for position, value in enumerate(folded):
+                if limit is not None and len(found) >= limit:
+                    break
+                if (prefix in value and not value.startswith(prefix)
+                        and matches(position)):
+                    found.append(position)
+        return [self._item(position) for position in found]
+
+
+class IngredientIndex:
+    """
+    Справочник ингредиентов в памяти процесса.
+    Актуальность сверяется с версией в кеше, которую увеличивают
+    сигналы сохранения/удаления ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshot = None
+
+    @staticmethod
+    def current_version():
+        return get_version(INGREDIENTS)
+
+    @staticmethod
+    def invalidate():
+        bump_version(INGREDIENTS)
+
+    def _build(self, version):
+        return IngredientSnapshot(
+            version,
+            Ingredient.objects.order_by().values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+
+    def snapshot(self):
+        """
+        Актуальный справочник, если он включён (INGREDIENT_INDEX).
+        Версия в кеше читается один раз, поэтому снимок берётся один
+        раз на запрос. Пока справочник строит другой поток, возвращается
+        None без ожидания: запрос можно выполнить в БД.
+        """
+        if not settings.INGREDIENT_INDEX:
+            return None
+        version = self.current_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self._build(version)
+        finally:
+            self._lock.release()
+        return snapshot
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,121 @@
+import itertools
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from foodgram.benchmark import benchmark_database, measure
+from recipes.cooking_index import CookingIndex
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.versions import RECIPES, bump_version
+
+User = get_user_model()
+BATCH_SIZE = 20000
+
+
+def group_by_rank(ingredient_ids, max_missing=None):
+    """
+    То же ранжирование одним GROUP BY по IngredientInRecipe
+    """
+    queryset = IngredientInRecipe.objects.values('recipe_id').annotate(
+        matched=Count('id', filter=Q(ingredient_id__in=ingredient_ids)),
+        required=Count('id')
+    ).filter(matched__gt=0)
+    if max_missing is not None:
+        queryset = queryset.filter(required__lte=F('matched') + max_missing)
+    queryset = queryset.annotate(
+        coverage=Cast('matched', FloatField()) / F('required')
+    ).order_by('-coverage', '-matched', '-recipe_id')
+    return queryset.count(), [row['recipe_id'] for row in queryset[:6]]
+
+
+def index_rank(index, ingredient_ids, max_missing=None):
+    recipe_ids, _, _ = index.rank(ingredient_ids, max_missing)
+    return len(recipe_ids), recipe_ids[:6].tolist()
+
+
+class Command(BaseCommand):
+    help = ('Compare what_to_cook ranking by the in-memory index with '
+            'a GROUP BY query on a synthetic catalog in a test database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200_000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, recipes, ingredients):
+        """
+        Рецепты по 4-12 ингредиентов с частотой ингредиентов по Ципфу
+        """
+        weights = list(itertools.accumulate(
+            1 / rank for rank in range(1, ingredients + 1)
+        ))
+        author = User.objects.create(username='author',
+                                     email='author@example.com')
+        ingredient_ids = [ingredient.id for ingredient in (
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'ingredient{number}', measurement_unit='г')
+                for number in range(ingredients)
+            )
+        )]
+        with transaction.atomic():
+            for start in range(0, recipes, BATCH_SIZE):
+                created = Recipe.objects.bulk_create(
+                    Recipe(author=author, name='recipe', image='x.jpg',
+                           text='-', cooking_time=1)
+                    for _ in range(min(BATCH_SIZE, recipes - start))
+                )
+                IngredientInRecipe.objects.bulk_create((
+                    IngredientInRecipe(recipe_id=recipe.id,
+                                       ingredient_id=ingredient_ids[number],
+                                       amount=1)
+                    for recipe in created
+                    for number in set(random.choices(
+                        range(ingredients), cum_weights=weights,
+                        k=random.randint(4, 12)
+                    ))
+                ), batch_size=10000)
+        return ingredient_ids
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with benchmark_database():
+            ids = self.seed(options['recipes'], options['ingredients'])
+            self.stdout.write(
+                f'{options["recipes"]} рецептов, '
+                f'{IngredientInRecipe.objects.count()} строк состава'
+            )
+            index = CookingIndex()
+            build_ms, _ = measure(index._get_data)
+            self.stdout.write(f'Построение индекса: {build_ms:.0f} ms')
+            cases = (
+                ('5 частых', [ids[n] for n in (0, 1, 2, 5, 9)], None),
+                ('5 частых, max_missing=2',
+                 [ids[n] for n in (0, 1, 2, 5, 9)], 2),
+                ('3 редких', [ids[n] for n in (500, 900, 1500)], None),
+                ('20 разных, max_missing=1', ids[0:400:20], 1),
+            )
+            for name, ingredient_ids, max_missing in cases:
+                query_ms, expected = measure(group_by_rank, ingredient_ids,
+                                             max_missing, repeat=2)
+                index_ms, found = measure(index_rank, index, ingredient_ids,
+                                          max_missing, repeat=20)
+                if found != expected:
+                    raise AssertionError(f'{name}: {found} != {expected}')
+                self.stdout.write(
+                    f'{name}: совпадений {found[0]}, GROUP BY '
+                    f'{query_ms:.0f} ms, индекс {index_ms:.1f} ms'
+                )
+            bump_version(RECIPES)
+            index._data['built_at'] -= index.refresh_interval
+            stale_ms, _ = measure(index_rank, index, ids[:5])
+            started = time.perf_counter()
+            with index._lock:
+                rebuild_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f'Запрос после изменения рецептов: {stale_ms:.1f} ms '
+                f'(перестройка в фоне ещё {rebuild_ms:.0f} ms)'
+            )
@@ -0,0 +1,43 @@
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand
+from recipes.images import prepare_recipe_images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Build card and detail renditions for existing recipe photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild renditions even if they already exist'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_card', 'image_detail'
+        )
+        if not options['all']:
+            recipes = recipes.filter(image_card='')
+        built = 0
+        for recipe in recipes.iterator():
+            try:
+                with recipe.image.open('rb') as file:
+                    images = prepare_recipe_images(file)
+            except (OSError, ValidationError) as error:
+                self.stderr.write(f'Рецепт {recipe.id}: {error}')
+                continue
+            images.pop('image')
+            old_files = [getattr(recipe, field).name for field in images]
+            for field, value in images.items():
+                setattr(recipe, field, value)
+            recipe.save(update_fields=[*images, 'updated_at'])
+            for name in old_files:
+                if name:
+                    recipe.image.storage.delete(name)
+            built += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'==>>>Подготовлены фото для {built} рецептов<<<=='
+        ))
@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+from recipes.models import Recipe
+from recipes.search import BATCH_SIZE, update_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Build full-text search documents for existing recipes'
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.order_by().values_list('id', flat=True)
+        built = 0
+        batch = []
+        for recipe_id in recipe_ids.iterator(chunk_size=BATCH_SIZE):
+            batch.append(recipe_id)
+            if len(batch) == BATCH_SIZE:
+                update_search_documents(batch)
+                built += len(batch)
+                batch = []
+        update_search_documents(batch)
+        built += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'==>>>Подготовлен поиск по {built} рецептам<<<=='
+        ))
@@ -0,0 +1,35 @@
+from django.core.management import BaseCommand
+from recipes.recommendations import (build_recommendations,
+                                     get_recommendation_stats)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild recipe co-occurrence and per-user recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Show timings of the last build and refreshes only'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = get_recommendation_stats()
+            build = stats['build']
+        else:
+            build = build_recommendations()
+            stats = get_recommendation_stats()
+        if build is not None:
+            for stage, seconds in build['stages'].items():
+                self.stdout.write(f'{stage}: {seconds:.2f} с')
+            self.stdout.write(self.style.SUCCESS(
+                f'==>>>Рекомендации: {build["users"]} пользователей, '
+                f'{build["recipes"]} рецептов со сходством, '
+                f'{build["interactions"]} взаимодействий<<<=='
+            ))
+        if stats['refreshes']:
+            self.stdout.write(
+                f'Пошаговых обновлений: {stats["refreshes"]}, '
+                f'в среднем {stats["refresh_avg_ms"]:.1f} мс'
+            )
@@ -1,6 +1,7 @@
 import json
 
 from django.core.management import BaseCommand
+from recipes.ingredient_index import ingredient_index
 from recipes.models import Ingredient
 
 
@@ -17,6 +18,7 @@ class Command(BaseCommand):
             Ingredient.objects.bulk_create(
                 [Ingredient(**data) for data in reader]
             )
+        ingredient_index.invalidate()
 
         self.stdout.write(self.style.SUCCESS(
             '==>>>Ингредиенты успешно загружены в БД<<<=='
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def _run_statements(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for statement in statements.get(vendor,
+                                        statements.get('default', ())):
+            schema_editor.execute(statement)
+    return run
+
+
+def run_vendor_sql(forward, backward):
+    """
+    Операция миграции с SQL для разных СУБД. forward и backward -
+    словари {vendor: statements}; ключ 'default' - для остальных СУБД,
+    без него миграция на них ничего не делает.
+    """
+    return migrations.RunPython(_run_statements(forward),
+                                _run_statements(backward))
@@ -0,0 +1,35 @@
+from django.db import migrations
+from recipes.migration_sql import run_vendor_sql
+
+POSTGRESQL_FORWARD = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_lower_prefix '
+    'ON recipes_ingredient (LOWER(name) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_lower_trgm '
+    'ON recipes_ingredient USING gin (LOWER(name) gin_trgm_ops)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_ingredient_name_lower_trgm',
+    'DROP INDEX IF EXISTS recipes_ingredient_name_lower_prefix',
+)
+DEFAULT_FORWARD = (
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_lower_prefix '
+    'ON recipes_ingredient (LOWER(name))',
+)
+DEFAULT_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_ingredient_name_lower_prefix',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppingcarttotal'),
+    ]
+
+    operations = [
+        run_vendor_sql(
+            {'postgresql': POSTGRESQL_FORWARD, 'default': DEFAULT_FORWARD},
+            {'postgresql': POSTGRESQL_BACKWARD, 'default': DEFAULT_BACKWARD},
+        ),
+    ]
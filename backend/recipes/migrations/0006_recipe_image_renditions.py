@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_card',
+            field=models.ImageField(blank=True, editable=False, upload_to='фото_рецептов/card', verbose_name='Фото для карточки рецепта'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_detail',
+            field=models.ImageField(blank=True, editable=False, upload_to='фото_рецептов/detail', verbose_name='Фото для страницы рецепта'),
+        ),
+    ]
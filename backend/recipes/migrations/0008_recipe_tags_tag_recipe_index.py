@@ -0,0 +1,32 @@
+from django.db import migrations
+from recipes.migration_sql import run_vendor_sql
+
+POSTGRESQL_FORWARD = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS recipes_recipe_tags_tag_recipe '
+    'ON recipes_recipe_tags (tag_id, recipe_id)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX CONCURRENTLY IF EXISTS recipes_recipe_tags_tag_recipe',
+)
+DEFAULT_FORWARD = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_tags_tag_recipe '
+    'ON recipes_recipe_tags (tag_id, recipe_id)',
+)
+DEFAULT_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_recipe_tags_tag_recipe',
+)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_status'),
+    ]
+
+    operations = [
+        run_vendor_sql(
+            {'postgresql': POSTGRESQL_FORWARD, 'default': DEFAULT_FORWARD},
+            {'postgresql': POSTGRESQL_BACKWARD, 'default': DEFAULT_BACKWARD},
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from recipes.migration_sql import run_vendor_sql
+
+POSTGRESQL_FORWARD = (
+    'CREATE TABLE IF NOT EXISTS recipes_recipe_search ('
+    'recipe_id bigint PRIMARY KEY '
+    'REFERENCES recipes_recipe (id) ON DELETE CASCADE '
+    'DEFERRABLE INITIALLY DEFERRED, '
+    'document tsvector NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_document '
+    'ON recipes_recipe_search USING gin (document)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_search',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_search '
+    'USING fts5(name, ingredients, text, '
+    "tokenize='unicode61 remove_diacritics 2')",
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_search',
+)
+FORWARD = {'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}
+BACKWARD = {'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_tags_tag_recipe_index'),
+    ]
+
+    operations = [
+        run_vendor_sql(FORWARD, BACKWARD),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 19:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCooccurrence',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cooccurrence', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('recipe_ids', models.BinaryField(verbose_name='Рецепты')),
+                ('scores', models.BinaryField(verbose_name='Сходство')),
+            ],
+            options={
+                'verbose_name': 'Совместно сохраняемые рецепты',
+                'verbose_name_plural': 'Совместно сохраняемые рецепты',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRecommendations',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendations', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('recipe_ids', models.BinaryField(verbose_name='Рецепты')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Рекомендации',
+                'verbose_name_plural': 'Рекомендации',
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-18 19:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+from recipes.migration_sql import run_vendor_sql
+
+# В PostgreSQL у таблицы уже есть recipe_id; в FTS5 добавляется
+# неиндексируемый столбец recipe_id (= rowid) для JOIN с рецептами
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE recipes_recipe_search_new '
+    'USING fts5(recipe_id UNINDEXED, name, ingredients, text, '
+    "tokenize='unicode61 remove_diacritics 2')",
+    'INSERT INTO recipes_recipe_search_new '
+    '(rowid, recipe_id, name, ingredients, text) '
+    'SELECT rowid, rowid, name, ingredients, text FROM recipes_recipe_search',
+    'DROP TABLE recipes_recipe_search',
+    'ALTER TABLE recipes_recipe_search_new RENAME TO recipes_recipe_search',
+)
+SQLITE_BACKWARD = (
+    'CREATE VIRTUAL TABLE recipes_recipe_search_old '
+    'USING fts5(name, ingredients, text, '
+    "tokenize='unicode61 remove_diacritics 2')",
+    'INSERT INTO recipes_recipe_search_old (rowid, name, ingredients, text) '
+    'SELECT rowid, name, ingredients, text FROM recipes_recipe_search',
+    'DROP TABLE recipes_recipe_search',
+    'ALTER TABLE recipes_recipe_search_old RENAME TO recipes_recipe_search',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recommendations'),
+    ]
+
+    operations = [
+        run_vendor_sql({'sqlite': SQLITE_FORWARD},
+                       {'sqlite': SQLITE_BACKWARD}),
+        migrations.CreateModel(
+            name='RecipeSearchDocument',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ рецепта',
+                'verbose_name_plural': 'Поисковые документы рецептов',
+                'db_table': 'recipes_recipe_search',
+                'managed': False,
+            },
+        ),
+    ]
@@ -43,10 +43,58 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """
+    Выборки рецептов для чтения
+    """
+    def with_related(self):
+        return self.select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredient',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            )
+        )
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=models.Exists(
+                FavoriteRecipe.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk')
+                )
+            )
+        )
+
+    def for_read(self, user):
+        return self.with_related().with_user_flags(user)
+
+
 class Recipe(models.Model):
     """
     Рецепты
     """
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = (
+        (IMAGE_PENDING, 'Обрабатывается'),
+        (IMAGE_READY, 'Готово'),
+        (IMAGE_FAILED, 'Ошибка обработки'),
+    )
+
     author = models.ForeignKey(User,
                                on_delete=models.SET_NULL,
                                null=True,
@@ -57,6 +105,19 @@ class Recipe(models.Model):
                             verbose_name='Название рецепта')
     image = models.ImageField(upload_to='фото_рецептов',
                               verbose_name='Фото рецепта')
+    image_detail = models.ImageField(upload_to='фото_рецептов/detail',
+                                     blank=True,
+                                     editable=False,
+                                     verbose_name='Фото для страницы рецепта')
+    image_card = models.ImageField(upload_to='фото_рецептов/card',
+                                   blank=True,
+                                   editable=False,
+                                   verbose_name='Фото для карточки рецепта')
+    image_status = models.CharField(max_length=10,
+                                    choices=IMAGE_STATUSES,
+                                    default=IMAGE_READY,
+                                    editable=False,
+                                    verbose_name='Обработка фото')
     text = models.TextField(verbose_name='Описание приготовления рецепта')
     cooking_time = models.IntegerField(
         verbose_name='Время приготовления'
@@ -68,11 +129,19 @@ class Recipe(models.Model):
                                          through='IngredientInRecipe')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date', )
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx')
+        ]
 
     def __str__(self):
         return self.name
@@ -161,3 +230,126 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} у {self.user}'
+
+
+class ShoppingCartTotal(models.Model):
+    """
+    Суммарное количество ингредиентов в списке покупок пользователя
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='shopping_cart_totals',
+                             verbose_name='Пользователь')
+    ingredient = models.ForeignKey(Ingredient,
+                                   on_delete=models.CASCADE,
+                                   related_name='shopping_cart_totals',
+                                   verbose_name='Ингредиент')
+    amount = models.PositiveIntegerField(verbose_name='Общее количество')
+
+    class Meta:
+        ordering = ('user', )
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_total'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.amount} у {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Похожие рецепты, рассчитанные заранее по ингредиентам и тегам
+    """
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='similar_recipes',
+                               verbose_name='Рецепт')
+    similar = models.ForeignKey(Recipe,
+                                on_delete=models.CASCADE,
+                                related_name='similar_to',
+                                verbose_name='Похожий рецепт')
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='similar_recipe_score_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class RecipeSearchDocument(models.Model):
+    """
+    Поисковый документ рецепта. Таблица своя для каждой СУБД
+    и заполняется recipes.search; модель нужна для JOIN при поиске.
+    """
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.DO_NOTHING,
+                                  primary_key=True,
+                                  related_name='search_document',
+                                  verbose_name='Рецепт')
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_search'
+        verbose_name = 'Поисковый документ рецепта'
+        verbose_name_plural = 'Поисковые документы рецептов'
+
+
+class RecipeCooccurrence(models.Model):
+    """
+    Рецепты, которые сохраняют вместе с данным, и их сходство.
+    id и сходство упакованы в массивы, список читается одной строкой.
+    """
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='cooccurrence',
+                                  verbose_name='Рецепт')
+    recipe_ids = models.BinaryField(verbose_name='Рецепты')
+    scores = models.BinaryField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Совместно сохраняемые рецепты'
+        verbose_name_plural = 'Совместно сохраняемые рецепты'
+
+    def __str__(self):
+        return f'Сохраняют вместе с {self.recipe}'
+
+
+class UserRecommendations(models.Model):
+    """
+    Рекомендации пользователю: id рецептов по убыванию оценки,
+    упакованные в массив
+    """
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='recommendations',
+                                verbose_name='Пользователь')
+    recipe_ids = models.BinaryField(verbose_name='Рецепты')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Рекомендации'
+        verbose_name_plural = 'Рекомендации'
+
+    def __str__(self):
+        return f'Рекомендации для {self.user}'
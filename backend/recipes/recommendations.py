@@ -0,0 +1,466 @@
+import time
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from foodgram.caches import increment
+from users.models import Subscription
+
+from .models import (FavoriteRecipe, Recipe, RecipeCooccurrence, ShoppingCart,
+                     UserRecommendations)
+from .sparse import (blocks, csr, group_starts, load_pairs, ranges,
+                     top_per_group)
+
+ID_DTYPE = '<i8'
+SCORE_DTYPE = '<f4'
+POPULAR_KEY = 'popular_recipes'
+POPULAR_TIMEOUT = 60 * 60
+BUILD_STATS_KEY = 'recommendations_build'
+REFRESH_STATS_KEYS = {'count': 'recommendations_refreshes',
+                      'ms': 'recommendations_refresh_ms'}
+
+
+def get_recommendation_settings():
+    return settings.RECOMMENDATIONS
+
+
+def get_interaction_weights():
+    config = get_recommendation_settings()
+    return ((FavoriteRecipe, config['FAVORITE_WEIGHT']),
+            (ShoppingCart, config['SHOPPING_CART_WEIGHT']))
+
+
+def _recipe_authors(queryset):
+    """
+    Пары (рецепт, автор); у рецептов удалённых авторов автор - 0
+    """
+    return load_pairs(
+        queryset.annotate(owner_id=Coalesce(
+            'author_id', 0, output_field=IntegerField()
+        )),
+        'id', 'owner_id'
+    )
+
+
+def pack(values, dtype=ID_DTYPE):
+    return np.asarray(values, dtype=dtype).tobytes()
+
+
+def unpack(data, dtype=ID_DTYPE):
+    return np.frombuffer(bytes(data), dtype=dtype)
+
+
+class Timer:
+    """
+    Длительность этапов расчёта в секундах
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._started = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = (self.stages.get(stage, 0)
+                              + now - self._started)
+        self._started = now
+
+
+class Interactions:
+    """
+    Избранное и списки покупок как разреженная матрица пользователь x
+    рецепт (CSR в обе стороны). Пара из избранного и списка покупок
+    складывается; у пользователя учитываются MAX_USER_ITEMS рецептов
+    с наибольшим весом, затем самых новых.
+    """
+
+    def __init__(self, users=None):
+        rows, weights = [], []
+        for model, weight in get_interaction_weights():
+            queryset = model.objects.all()
+            if users is not None:
+                queryset = queryset.filter(user_id__in=users)
+            pairs = load_pairs(queryset, 'user_id', 'recipe_id')
+            rows.append(pairs)
+            weights.append(np.full(len(pairs), weight))
+        rows = np.concatenate(rows)
+        self.user_ids, users = np.unique(rows[:, 0], return_inverse=True)
+        self.recipe_ids, recipes = np.unique(rows[:, 1],
+                                             return_inverse=True)
+        size = len(self.recipe_ids)
+        keys, inverse = np.unique(users * size + recipes,
+                                  return_inverse=True)
+        weights = np.bincount(inverse, weights=np.concatenate(weights))
+        users, recipes = np.divmod(keys, size)
+
+        order = np.lexsort((-recipes, -weights, users))
+        users, recipes, weights = users[order], recipes[order], weights[order]
+        kept = (np.arange(len(users)) - group_starts(users)
+                < get_recommendation_settings()['MAX_USER_ITEMS'])
+        users, recipes, weights = users[kept], recipes[kept], weights[kept]
+        self.count = len(users)
+        self.user_indptr, self.user_recipes, self.user_weights = csr(
+            users, recipes, len(self.user_ids), weights
+        )
+        self.recipe_indptr, self.recipe_users, self.recipe_weights = csr(
+            recipes, users, size, weights
+        )
+        self.norms = np.sqrt(np.bincount(recipes, weights=weights ** 2,
+                                         minlength=size))
+
+    def _neighbors(self, positions, limit):
+        """
+        Косинусное сходство рецептов positions с рецептами, которые
+        сохранили те же пользователи: до limit лучших на рецепт
+        """
+        size = len(self.recipe_ids)
+        starts = self.recipe_indptr[positions]
+        ends = self.recipe_indptr[positions + 1]
+        entries = ranges(starts, ends)
+        queries = np.repeat(np.arange(len(positions)), ends - starts)
+        users = self.recipe_users[entries]
+        starts, ends = self.user_indptr[users], self.user_indptr[users + 1]
+        expanded = ranges(starts, ends)
+        keys, inverse = np.unique(
+            np.repeat(queries, ends - starts) * size
+            + self.user_recipes[expanded],
+            return_inverse=True
+        )
+        dots = np.bincount(inverse, weights=(
+            np.repeat(self.recipe_weights[entries], ends - starts)
+            * self.user_weights[expanded]
+        ))
+        queries, neighbors = np.divmod(keys, size)
+        other = neighbors != positions[queries]
+        queries, neighbors = queries[other], neighbors[other]
+        scores = dots[other] / (self.norms[positions[queries]]
+                                * self.norms[neighbors])
+        best = top_per_group(queries, scores, limit, kind='stable')
+        return positions[queries[best]], neighbors[best], scores[best]
+
+    def cooccurrence(self, limit, block_size):
+        """
+        До limit соседей каждого рецепта: номера рецептов, номера
+        соседей и сходство, по рецептам и убыванию сходства
+        """
+        user_lengths = np.diff(self.user_indptr)[self.recipe_users]
+        work = np.append(0, np.cumsum(user_lengths))[self.recipe_indptr]
+        parts = [
+            self._neighbors(positions, limit)
+            for positions in blocks(np.diff(work), block_size)
+        ]
+        if not parts:
+            return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                    np.empty(0))
+        return tuple(map(np.concatenate, zip(*parts)))
+
+
+def _sorted_keys(keys):
+    """
+    Ключи по возрастанию с ограничителем в конце для поиска
+    """
+    return np.append(np.sort(keys), np.iinfo(np.int64).max)
+
+
+def _contains(sorted_keys, keys):
+    return sorted_keys[np.searchsorted(sorted_keys, keys)] == keys
+
+
+class Recommender:
+    """
+    Оценка рецепта для пользователя - сумма сходства с его рецептами,
+    умноженного на веса взаимодействий. Рецепты авторов из подписок
+    получают надбавку SUBSCRIPTION_BOOST. Сохранённые пользователем,
+    его собственные и удалённые рецепты не рекомендуются.
+    neighbors - CSR по номерам рецептов interactions: id соседей
+    и сходство; authors и subscriptions - пары (рецепт, автор)
+    и (пользователь, автор).
+    """
+
+    def __init__(self, interactions, neighbors, authors, subscriptions):
+        self.interactions = interactions
+        self.indptr, self.neighbor_ids, self.neighbor_scores = neighbors
+        self.boost = get_recommendation_settings()['SUBSCRIPTION_BOOST']
+        self.author_recipes = _sorted_keys(authors[:, 0])
+        self.authors = np.append(authors[np.argsort(authors[:, 0]), 1], 0)
+        self.recipe_span = 1 + max(authors[:, 0].max(initial=0),
+                                   self.neighbor_ids.max(initial=0),
+                                   interactions.recipe_ids.max(initial=0))
+        self.user_span = 1 + max(authors[:, 1].max(initial=0),
+                                 subscriptions.max(initial=0),
+                                 interactions.user_ids.max(initial=0))
+        self.subscriptions = _sorted_keys(
+            subscriptions[:, 0] * self.user_span + subscriptions[:, 1]
+        )
+        self.saved = _sorted_keys(
+            np.repeat(np.arange(len(interactions.user_ids)),
+                      np.diff(interactions.user_indptr)) * self.recipe_span
+            + interactions.recipe_ids[interactions.user_recipes]
+        )
+
+    def work(self):
+        """
+        Число пар пользователь-кандидат по пользователям
+        """
+        interactions = self.interactions
+        lengths = np.diff(self.indptr)[interactions.user_recipes]
+        return np.diff(
+            np.append(0, np.cumsum(lengths))[interactions.user_indptr]
+        )
+
+    def _candidates(self, positions):
+        """
+        Суммарные оценки рецептов-соседей для пользователей positions:
+        номера в positions, id рецептов и оценки
+        """
+        interactions = self.interactions
+        starts = interactions.user_indptr[positions]
+        ends = interactions.user_indptr[positions + 1]
+        entries = ranges(starts, ends)
+        queries = np.repeat(np.arange(len(positions)), ends - starts)
+        recipes = interactions.user_recipes[entries]
+        starts, ends = self.indptr[recipes], self.indptr[recipes + 1]
+        expanded = ranges(starts, ends)
+        keys, inverse = np.unique(
+            np.repeat(queries, ends - starts) * self.recipe_span
+            + self.neighbor_ids[expanded],
+            return_inverse=True
+        )
+        scores = np.bincount(inverse, weights=(
+            np.repeat(interactions.user_weights[entries], ends - starts)
+            * self.neighbor_scores[expanded]
+        ))
+        return (*np.divmod(keys, self.recipe_span), scores)
+
+    def recommend(self, positions, limit):
+        """
+        До limit рекомендаций пользователям positions: номера
+        в positions, id рецептов и оценки по убыванию
+        """
+        queries, recipe_ids, scores = self._candidates(positions)
+        users = positions[queries]
+        user_ids = self.interactions.user_ids[users]
+        found = np.searchsorted(self.author_recipes, recipe_ids)
+        authors = self.authors[found]
+        allowed = (
+            (self.author_recipes[found] == recipe_ids)
+            & (authors != user_ids)
+            & ~_contains(self.saved, users * self.recipe_span + recipe_ids)
+        )
+        scores = scores * (1 + self.boost * _contains(
+            self.subscriptions, user_ids * self.user_span + authors
+        ))
+        queries, recipe_ids = queries[allowed], recipe_ids[allowed]
+        scores = scores[allowed]
+        best = top_per_group(queries, scores, limit, kind='stable')
+        return queries[best], recipe_ids[best], scores[best]
+
+
+def _neighbor_lists(rows, size, *values):
+    """
+    CSR из строк, уже упорядоченных по номерам rows
+    """
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return (indptr, *values)
+
+
+def _split(groups, *values):
+    """
+    Значения, разбитые на отрезки одинаковых groups
+    (groups отсортированы): номер группы и отрезки
+    """
+    if not len(groups):
+        return ()
+    bounds = np.flatnonzero(np.diff(groups)) + 1
+    starts = np.append(0, bounds)
+    return zip(groups[starts].tolist(),
+               *(np.split(value, bounds) for value in values))
+
+
+def build_recommendations():
+    """
+    Полный пересчёт: сходство рецептов по совместным сохранениям,
+    рекомендации всем пользователям и популярные рецепты.
+    Возвращает статистику с длительностью этапов, она же сохраняется
+    в кеше.
+    """
+    config = get_recommendation_settings()
+    timer = Timer()
+    interactions = Interactions()
+    authors = _recipe_authors(Recipe.objects)
+    subscriptions = load_pairs(Subscription.objects, 'user_id', 'author_id')
+    timer.lap('load')
+    rows, neighbors, scores = interactions.cooccurrence(
+        config['ITEM_NEIGHBORS'], config['BLOCK_SIZE']
+    )
+    neighbor_ids = interactions.recipe_ids[neighbors]
+    timer.lap('cooccurrence')
+    recommender = Recommender(
+        interactions,
+        _neighbor_lists(rows, len(interactions.recipe_ids), neighbor_ids,
+                        scores),
+        authors, subscriptions
+    )
+    recommendations = []
+    for positions in blocks(recommender.work(), config['BLOCK_SIZE']):
+        queries, recipe_ids, _ = recommender.recommend(positions,
+                                                       config['PER_USER'])
+        recommendations.extend(
+            UserRecommendations(user_id=user_id, recipe_ids=pack(ids))
+            for user_id, ids in _split(
+                interactions.user_ids[positions[queries]], recipe_ids
+            )
+        )
+    timer.lap('recommendations')
+    with transaction.atomic():
+        RecipeCooccurrence.objects.all().delete()
+        RecipeCooccurrence.objects.bulk_create([
+            RecipeCooccurrence(recipe_id=recipe_id, recipe_ids=pack(ids),
+                               scores=pack(values, SCORE_DTYPE))
+            for recipe_id, ids, values in _split(
+                interactions.recipe_ids[rows], neighbor_ids, scores
+            )
+        ], batch_size=1000)
+        UserRecommendations.objects.all().delete()
+        UserRecommendations.objects.bulk_create(recommendations,
+                                                batch_size=1000)
+    timer.lap('save')
+    popular_recipe_ids(refresh=True)
+    timer.lap('popular')
+    stats = {
+        'built_at': timezone.now().isoformat(),
+        'interactions': interactions.count,
+        'users': len(recommendations),
+        'recipes': len(np.unique(rows)),
+        'stages': timer.stages,
+    }
+    cache.set(BUILD_STATS_KEY, stats, timeout=None)
+    return stats
+
+
+def _stored_neighbors(recipe_ids):
+    """
+    Сохранённые соседи рецептов recipe_ids в виде CSR по их номерам
+    """
+    stored = {
+        row.recipe_id: row for row in RecipeCooccurrence.objects.filter(
+            recipe_id__in=recipe_ids.tolist()
+        )
+    }
+    ids, scores = [], []
+    for recipe_id in recipe_ids.tolist():
+        row = stored.get(recipe_id)
+        ids.append(unpack(row.recipe_ids) if row else np.empty(0, ID_DTYPE))
+        scores.append(unpack(row.scores, SCORE_DTYPE) if row
+                      else np.empty(0, SCORE_DTYPE))
+    indptr = np.append(0, np.cumsum([len(part) for part in ids],
+                                    dtype=np.int64))
+    return (indptr,
+            np.concatenate(ids or [np.empty(0, ID_DTYPE)]).astype(np.int64),
+            np.concatenate(scores or [np.empty(0, SCORE_DTYPE)]))
+
+
+def count_refresh(milliseconds):
+    increment(REFRESH_STATS_KEYS['count'])
+    increment(REFRESH_STATS_KEYS['ms'], milliseconds)
+
+
+def refresh_user_recommendations(user_id):
+    """
+    Пересчёт рекомендаций одного пользователя по сохранённому сходству
+    рецептов. Новые рецепты получают соседей при полном пересчёте.
+    """
+    timer = Timer()
+    interactions = Interactions(users=[user_id])
+    neighbors = _stored_neighbors(interactions.recipe_ids)
+    recommender = Recommender(
+        interactions, neighbors,
+        _recipe_authors(Recipe.objects.filter(pk__in=np.unique(
+            neighbors[1]
+        ).tolist())),
+        load_pairs(Subscription.objects.filter(user_id=user_id),
+                   'user_id', 'author_id')
+    )
+    _, recipe_ids, _ = recommender.recommend(
+        np.arange(len(interactions.user_ids)),
+        get_recommendation_settings()['PER_USER']
+    )
+    if len(recipe_ids):
+        UserRecommendations.objects.update_or_create(
+            user_id=user_id, defaults={'recipe_ids': pack(recipe_ids)}
+        )
+    else:
+        UserRecommendations.objects.filter(user_id=user_id).delete()
+    timer.lap('refresh')
+    count_refresh(round(timer.stages['refresh'] * 1000))
+
+
+def get_recommendation_stats():
+    """
+    Статистика последнего полного пересчёта и пошаговых обновлений
+    """
+    count = cache.get(REFRESH_STATS_KEYS['count'], 0)
+    milliseconds = cache.get(REFRESH_STATS_KEYS['ms'], 0)
+    return {
+        'build': cache.get(BUILD_STATS_KEY),
+        'refreshes': count,
+        'refresh_avg_ms': milliseconds / count if count else None,
+    }
+
+
+def popular_recipe_ids(refresh=False):
+    """
+    Чаще всего сохраняемые рецепты (с весами избранного и списка
+    покупок) - лента для пользователей без рекомендаций
+    """
+    recipe_ids = None if refresh else cache.get(POPULAR_KEY)
+    if recipe_ids is None:
+        limit = get_recommendation_settings()['POPULAR']
+        scores = Counter()
+        for model, weight in get_interaction_weights():
+            for recipe_id, count in model.objects.order_by().values(
+                'recipe_id'
+            ).annotate(
+                count=Count('id')
+            ).order_by('-count', '-recipe_id').values_list(
+                'recipe_id', 'count'
+            )[:limit]:
+                scores[recipe_id] += weight * count
+        recipe_ids = [
+            recipe_id for recipe_id, _ in sorted(
+                scores.items(), key=lambda item: (-item[1], -item[0])
+            )[:limit]
+        ]
+        cache.set(POPULAR_KEY, recipe_ids, POPULAR_TIMEOUT)
+    return recipe_ids
+
+
+def get_feed_recipe_ids(user, exclude=()):
+    """
+    id рецептов ленты: рекомендации пользователя, затем популярные,
+    без повторов, без exclude и без собственных рецептов пользователя
+    """
+    personal = []
+    seen = set(exclude)
+    if user.is_authenticated:
+        packed = UserRecommendations.objects.filter(
+            user=user
+        ).values_list('recipe_ids', flat=True).first()
+        if packed is not None:
+            personal = unpack(packed).tolist()
+        seen.update(Recipe.objects.filter(author=user).values_list(
+            'id', flat=True
+        ))
+    feed = []
+    for recipe_id in chain(personal, popular_recipe_ids()):
+        if recipe_id not in seen:
+            seen.add(recipe_id)
+            feed.append(recipe_id)
+    return feed
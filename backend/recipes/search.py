@@ -0,0 +1,185 @@
+import re
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import IngredientInRecipe, Recipe, RecipeSearchDocument
+
+SEARCH_TABLE = RecipeSearchDocument._meta.db_table
+SEARCH_RANK = 'search_rank'
+SEARCH_FIELDS = frozenset({'name', 'text'})
+BATCH_SIZE = 500
+UNRANKED = Value(0.0, output_field=FloatField())
+
+
+def normalize(text):
+    """
+    ё не отличается от е ни в документах, ни в запросах
+    """
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _documents(recipe_ids):
+    """
+    Поисковые документы рецептов: название, ингредиенты и описание
+    """
+    ingredients = defaultdict(list)
+    for recipe_id, name in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list('recipe_id', 'ingredient__name'):
+        ingredients[recipe_id].append(name)
+    return [
+        (recipe_id, normalize(name),
+         normalize(' '.join(ingredients[recipe_id])), normalize(text))
+        for recipe_id, name, text in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).order_by().values_list('id', 'name', 'text')
+    ]
+
+
+def _join_documents(queryset, match, rank):
+    """
+    JOIN рецептов с таблицей документов; условие match и ранг rank -
+    пары (SQL, параметры), ссылающиеся на её столбцы
+    """
+    return queryset.filter(
+        RawSQL(*match, output_field=BooleanField()),
+        search_document__isnull=False
+    ).alias(**{
+        SEARCH_RANK: RawSQL(*rank, output_field=FloatField())
+    })
+
+
+class PostgreSQLSearch:
+    """
+    tsvector с весами (название - A, ингредиенты - B, описание - C)
+    в отдельной таблице с GIN-индексом; ранжирование ts_rank_cd
+    """
+    config = 'russian'
+    upsert_sql = (
+        f'INSERT INTO {SEARCH_TABLE} (recipe_id, document) VALUES (%s, '
+        f"setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+        f"setweight(to_tsvector(%s::regconfig, %s), 'B') || "
+        f"setweight(to_tsvector(%s::regconfig, %s), 'C')) "
+        f'ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document'
+    )
+    match_sql = (
+        f'{SEARCH_TABLE}.document @@ websearch_to_tsquery(%s::regconfig, %s)'
+    )
+    rank_sql = (
+        f'ts_rank_cd({SEARCH_TABLE}.document, '
+        f'websearch_to_tsquery(%s::regconfig, %s))'
+    )
+
+    def update(self, cursor, recipe_ids):
+        documents = _documents(recipe_ids)
+        cursor.executemany(self.upsert_sql, [
+            (recipe_id, self.config, name, self.config, ingredients,
+             self.config, text)
+            for recipe_id, name, ingredients, text in documents
+        ])
+        missing = set(recipe_ids) - {document[0] for document in documents}
+        if missing:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE recipe_id = ANY(%s)',
+                [list(missing)]
+            )
+
+    def search(self, queryset, query):
+        params = (self.config, query)
+        return _join_documents(queryset, (self.match_sql, params),
+                               (self.rank_sql, params))
+
+
+class SQLiteSearch:
+    """
+    Виртуальная таблица FTS5 (rowid и неиндексируемый recipe_id -
+    id рецепта), ранжирование bm25. Слова запроса ищутся по началу,
+    все слова обязательны.
+    """
+    # веса столбцов recipe_id, name, ingredients, text
+    weights = (0.0, 10.0, 4.0, 1.0)
+    match_sql = f'{SEARCH_TABLE} MATCH %s'
+
+    @property
+    def rank_sql(self):
+        weights = ', '.join(map(str, self.weights))
+        return f'-bm25({SEARCH_TABLE}, {weights})'
+
+    def update(self, cursor, recipe_ids):
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+            list(recipe_ids)
+        )
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} '
+            f'(rowid, recipe_id, name, ingredients, text) '
+            f'VALUES (%s, %s, %s, %s, %s)',
+            [(document[0], ) + document
+             for document in _documents(recipe_ids)]
+        )
+
+    @staticmethod
+    def to_match(query):
+        words = re.findall(r'\w+', query.casefold())
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search(self, queryset, query):
+        match = self.to_match(query)
+        if not match:
+            return queryset.none().alias(**{SEARCH_RANK: UNRANKED})
+        return _join_documents(queryset, (self.match_sql, (match, )),
+                               (self.rank_sql, ()))
+
+
+class DefaultSearch:
+    """
+    Поиск по вхождению для остальных СУБД, без ранжирования
+    """
+
+    def update(self, cursor, recipe_ids):
+        pass
+
+    def search(self, queryset, query):
+        condition = Q()
+        for word in query.split():
+            condition &= (Q(name__icontains=word)
+                          | Q(text__icontains=word)
+                          | Q(ingredients__name__icontains=word))
+        return queryset.filter(
+            pk__in=Recipe.objects.filter(condition).values('pk')
+        ).alias(**{SEARCH_RANK: UNRANKED})
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgreSQLSearch,
+    'sqlite': SQLiteSearch,
+}
+
+
+def get_search_backend():
+    return SEARCH_BACKENDS.get(connection.vendor, DefaultSearch)()
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты, подходящие под запрос, от более релевантных к менее
+    """
+    return get_search_backend().search(
+        queryset, normalize(query)
+    ).order_by(f'-{SEARCH_RANK}', '-pub_date', '-id')
+
+
+def update_search_documents(recipe_ids):
+    """
+    Пересчёт поисковых документов; документы удалённых рецептов
+    удаляются
+    """
+    recipe_ids = list(recipe_ids)
+    backend = get_search_backend()
+    with connection.cursor() as cursor:
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            backend.update(cursor, recipe_ids[start:start + BATCH_SIZE])
@@ -0,0 +1,113 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from jobs.queue import enqueue
+from users.models import Subscription
+
+from .models import (FavoriteRecipe, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .search import SEARCH_FIELDS, update_search_documents
+from .tasks import (schedule_recommendations, schedule_similar_recipes,
+                    update_ingredient_search)
+from .versions import INGREDIENTS, RECIPES, TAGS, bump_version
+
+User = get_user_model()
+
+# поля автора, которые выводятся в рецептах
+AUTHOR_FIELDS = frozenset({'email', 'first_name', 'last_name', 'username'})
+
+
+def bump_on_commit(*names):
+    for name in names:
+        transaction.on_commit(partial(bump_version, name))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_on_commit(INGREDIENTS, RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_on_commit(TAGS, RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+@receiver((post_save, post_delete), sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(**kwargs):
+    bump_on_commit(RECIPES)
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(instance, update_fields=None, raw=False,
+                           **kwargs):
+    instance._stored_author = None
+    if instance.pk is None or raw or update_fields is not None:
+        return
+    instance._stored_author = User.objects.filter(
+        pk=instance.pk
+    ).values(*AUTHOR_FIELDS).first()
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_recipe_authors(instance, created=False, update_fields=None,
+                              **kwargs):
+    """
+    Рецепты показывают автора, поэтому устаревают только при изменении
+    полей из AUTHOR_FIELDS или удалении пользователя
+    """
+    if created:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    stored = getattr(instance, '_stored_author', None)
+    if stored is not None and all(
+        getattr(instance, field) == value for field, value in stored.items()
+    ):
+        return
+    bump_on_commit(RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipe_search(instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(partial(update_search_documents, [instance.id]))
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def update_recipe_ingredients_search(instance, **kwargs):
+    transaction.on_commit(
+        partial(update_search_documents, [instance.recipe_id])
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def schedule_ingredient_search(instance, created, **kwargs):
+    if created:
+        return
+    transaction.on_commit(partial(
+        enqueue, update_ingredient_search, {'ingredient_id': instance.id}
+    ))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_similarity(instance, update_fields=None, **kwargs):
+    if update_fields is not None:
+        return
+    transaction.on_commit(partial(schedule_similar_recipes, instance))
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def schedule_user_recommendations(instance, **kwargs):
+    transaction.on_commit(
+        partial(schedule_recommendations, instance.user_id)
+    )
@@ -0,0 +1,298 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import IngredientInRecipe, Recipe, SimilarRecipe
+from .sparse import (blocks, csr, group_starts, load_pairs, ranges,
+                     top_per_group)
+
+DOCUMENT_FREQUENCY_KEY = 'ingredient_document_frequency'
+DOCUMENT_FREQUENCY_TIMEOUT = 60 * 60
+INSERT_SQL = (f'INSERT INTO {SimilarRecipe._meta.db_table} '
+              f'(recipe_id, similar_id, score) VALUES (%s, %s, %s)')
+# numpy 1.24 не умеет bitwise_count: число единиц в каждом байте
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)],
+                    dtype=np.uint8)
+
+
+def get_similarity_settings():
+    return settings.SIMILAR_RECIPES
+
+
+def document_frequency(refresh=False):
+    """
+    Число рецептов с каждым ингредиентом и общее число рецептов.
+    Меняется медленно, поэтому для пошагового пересчёта берётся из кеша.
+    """
+    frequency = None if refresh else cache.get(DOCUMENT_FREQUENCY_KEY)
+    if frequency is None:
+        frequency = {
+            'total': Recipe.objects.count(),
+            'counts': dict(
+                IngredientInRecipe.objects.order_by().values(
+                    'ingredient_id'
+                ).annotate(
+                    count=Count('id')
+                ).values_list('ingredient_id', 'count')
+            ),
+        }
+        cache.set(DOCUMENT_FREQUENCY_KEY, frequency,
+                  DOCUMENT_FREQUENCY_TIMEOUT)
+    return frequency
+
+
+def get_max_df(frequency):
+    """
+    Ингредиенты из большего числа рецептов (соль, вода) не сближают
+    рецепты и не используются
+    """
+    config = get_similarity_settings()
+    return max(config['MAX_DF'] * frequency['total'], config['MAX_DF_FLOOR'])
+
+
+class RecipeVectors:
+    """
+    Разреженные векторы рецептов: ингредиенты с весом idf и теги с весом
+    TAG_WEIGHT. Ингредиенты хранятся по рецептам и по ингредиентам (CSR
+    в обе стороны), теги - битовыми масками.
+    Кандидаты в соседи - рецепты с общими ингредиентами: ингредиенты
+    рецепта перебираются от редких к частым, пока кандидатов меньше
+    MAX_CANDIDATES. Лучшие по частичному сходству кандидаты
+    пересчитываются точно; всё считается сразу для блока рецептов.
+    """
+    rescore_factor = 4
+
+    def __init__(self, recipe_ids, ingredients, tags, frequency):
+        config = get_similarity_settings()
+        self.tag_weight = config['TAG_WEIGHT']
+        self.max_candidates = config['MAX_CANDIDATES']
+        self.recipe_ids = np.unique(recipe_ids)
+        size = len(self.recipe_ids)
+
+        feature_ids, columns = np.unique(ingredients[:, 1],
+                                         return_inverse=True)
+        self.counts = np.maximum(np.array(
+            [frequency['counts'].get(feature_id, 0)
+             for feature_id in feature_ids.tolist()],
+            dtype=np.int64
+        ), 1)
+        kept = (self.counts <= get_max_df(frequency))[columns]
+        rows = np.searchsorted(self.recipe_ids, ingredients[kept, 0])
+        columns = columns[kept]
+        self.weights = np.log1p(frequency['total'] / self.counts) ** 2
+        self.indptr, self.features = csr(rows, columns, size)
+        self.feature_indptr, self.postings = csr(columns, rows,
+                                                 len(feature_ids))
+        # ключи (рецепт, ингредиент) по возрастанию для точного пересчёта
+        self.feature_count = max(len(feature_ids), 1)
+        self.keys = np.append(
+            np.repeat(np.arange(size), np.diff(self.indptr))
+            * self.feature_count + self.features,
+            np.iinfo(np.int64).max
+        )
+
+        tag_ids, tag_columns = np.unique(tags[:, 1], return_inverse=True)
+        dense = np.zeros((size, max(len(tag_ids), 1)), dtype=bool)
+        dense[np.searchsorted(self.recipe_ids, tags[:, 0]), tag_columns] = 1
+        self.tag_bits = np.packbits(dense, axis=1)
+        self.norms = np.sqrt(
+            np.bincount(rows, weights=self.weights[columns], minlength=size)
+            + self.tag_weight ** 2 * dense.sum(axis=1)
+        )
+
+    def _expand(self, positions):
+        """
+        Ингредиенты рецептов positions от редких к частым, пока
+        кандидатов меньше max_candidates: номера в positions
+        и ингредиенты
+        """
+        starts, ends = self.indptr[positions], self.indptr[positions + 1]
+        queries = np.repeat(np.arange(len(positions)), ends - starts)
+        features = self.features[ranges(starts, ends)]
+        order = np.lexsort((self.counts[features], queries))
+        queries, features = queries[order], features[order]
+        before = np.cumsum(self.counts[features]) - self.counts[features]
+        before = before - before[group_starts(queries)]
+        kept = before < self.max_candidates
+        return queries[kept], features[kept]
+
+    def _tag_dots(self, sources, candidates):
+        shared_tags = POPCOUNT[
+            self.tag_bits[sources] & self.tag_bits[candidates]
+        ].sum(axis=1)
+        return self.tag_weight ** 2 * shared_tags
+
+    def _cosine(self, sources, candidates):
+        """
+        Точное косинусное сходство пар рецептов
+        """
+        starts = self.indptr[candidates]
+        ends = self.indptr[candidates + 1]
+        pairs = np.repeat(np.arange(len(sources)), ends - starts)
+        features = self.features[ranges(starts, ends)]
+        keys = (np.repeat(sources, ends - starts) * self.feature_count
+                + features)
+        shared = self.keys[np.searchsorted(self.keys, keys)] == keys
+        dots = np.bincount(pairs[shared],
+                           weights=self.weights[features[shared]],
+                           minlength=len(sources))
+        return ((dots + self._tag_dots(sources, candidates))
+                / (self.norms[sources] * self.norms[candidates]))
+
+    def blocks(self, block_size):
+        """
+        Номера всех рецептов блоками примерно по block_size
+        пар рецепт-кандидат
+        """
+        queries, features = self._expand(np.arange(len(self.recipe_ids)))
+        return blocks(np.bincount(
+            queries,
+            weights=np.diff(self.feature_indptr)[features],
+            minlength=len(self.recipe_ids)
+        ), block_size)
+
+    def neighbors(self, positions, top_k):
+        """
+        До top_k соседей каждого рецепта из positions по убыванию
+        косинусного сходства: номера в positions, номера соседей
+        и сходство
+        """
+        size = len(self.recipe_ids)
+        queries, features = self._expand(positions)
+        starts = self.feature_indptr[features]
+        ends = self.feature_indptr[features + 1]
+        keys, inverse = np.unique(
+            np.repeat(queries, ends - starts) * size
+            + self.postings[ranges(starts, ends)],
+            return_inverse=True
+        )
+        partial = np.bincount(
+            inverse, weights=np.repeat(self.weights[features], ends - starts)
+        )
+        queries, candidates = np.divmod(keys, size)
+        other = candidates != positions[queries]
+        queries, candidates = queries[other], candidates[other]
+        partial = (partial[other]
+                   + self._tag_dots(positions[queries], candidates))
+        best = top_per_group(queries, partial / self.norms[candidates],
+                             top_k * self.rescore_factor)
+        best.sort()
+        queries, candidates = queries[best], candidates[best]
+        scores = self._cosine(positions[queries], candidates)
+        # при равном сходстве - по возрастанию id
+        best = top_per_group(queries, scores, top_k, kind='stable')
+        return queries[best], candidates[best], scores[best]
+
+
+def _save(recipe_ids, similar_ids, scores):
+    SimilarRecipe.objects.bulk_create(
+        [SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                       score=score)
+         for recipe_id, similar_id, score in zip(
+             recipe_ids.tolist(), similar_ids.tolist(), scores.tolist())],
+        ignore_conflicts=True
+    )
+
+
+def _trim(recipe_id, top_k):
+    """
+    Оставляет в списке рецепта top_k самых похожих
+    """
+    extra = SimilarRecipe.objects.filter(recipe_id=recipe_id).order_by(
+        '-score', 'similar_id'
+    ).values_list('id', flat=True)[top_k:]
+    SimilarRecipe.objects.filter(pk__in=list(extra)).delete()
+
+
+def build_similar_recipes():
+    """
+    Полный пересчёт похожих рецептов; старые списки заменяются в одной
+    транзакции. Возвращает число рецептов и сохранённых пар.
+    """
+    config = get_similarity_settings()
+    vectors = RecipeVectors(
+        np.array(Recipe.objects.order_by().values_list('id', flat=True),
+                 dtype=np.int64),
+        load_pairs(IngredientInRecipe.objects, 'recipe_id', 'ingredient_id'),
+        load_pairs(Recipe.tags.through.objects, 'recipe_id', 'tag_id'),
+        document_frequency(refresh=True)
+    )
+    saved = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        SimilarRecipe.objects.all().delete()
+        for positions in vectors.blocks(config['BLOCK_SIZE']):
+            queries, candidates, scores = vectors.neighbors(
+                positions, config['TOP_K']
+            )
+            cursor.executemany(INSERT_SQL, list(zip(
+                vectors.recipe_ids[positions[queries]].tolist(),
+                vectors.recipe_ids[candidates].tolist(),
+                scores.tolist()
+            )))
+            saved += len(scores)
+    return len(vectors.recipe_ids), saved
+
+
+def _expanded_features(recipe_id, frequency):
+    """
+    Ингредиенты рецепта, по которым ищутся кандидаты, - по тому же
+    правилу, что и RecipeVectors._expand
+    """
+    max_df = get_max_df(frequency)
+    max_candidates = get_similarity_settings()['MAX_CANDIDATES']
+    counts = sorted(
+        (max(frequency['counts'].get(ingredient_id, 0), 1), ingredient_id)
+        for ingredient_id in IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', flat=True)
+    )
+    features = []
+    candidates = 0
+    for count, ingredient_id in counts:
+        if count > max_df or candidates >= max_candidates:
+            break
+        features.append(ingredient_id)
+        candidates += count
+    return features
+
+
+def update_similar_recipes(recipe_id):
+    """
+    Пересчёт соседей одного рецепта. Его список заменяется, а сам он
+    попадает в списки новых соседей, если проходит в их top-K.
+    Из списков прежних соседей рецепт удаляется; освободившиеся места
+    заполнит следующая полная перестройка.
+    """
+    top_k = get_similarity_settings()['TOP_K']
+    frequency = document_frequency()
+    features = _expanded_features(recipe_id, frequency)
+    candidates = IngredientInRecipe.objects.filter(
+        ingredient_id__in=features
+    ).values('recipe_id')
+    ingredients = load_pairs(
+        IngredientInRecipe.objects.filter(recipe_id__in=candidates),
+        'recipe_id', 'ingredient_id'
+    )
+    vectors = RecipeVectors(
+        np.append(ingredients[:, 0], recipe_id),
+        ingredients,
+        load_pairs(
+            Recipe.tags.through.objects.filter(recipe_id__in=candidates),
+            'recipe_id', 'tag_id'
+        ),
+        frequency
+    )
+    position = np.searchsorted(vectors.recipe_ids, recipe_id)
+    _, neighbors, scores = vectors.neighbors(np.array([position]), top_k)
+    neighbor_ids = vectors.recipe_ids[neighbors]
+    recipe_ids = np.full(len(neighbor_ids), recipe_id)
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)
+        ).delete()
+        _save(recipe_ids, neighbor_ids, scores)
+        _save(neighbor_ids, recipe_ids, scores)
+        for neighbor_id in neighbor_ids.tolist():
+            _trim(neighbor_id, top_k)
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+def ranges(starts, ends):
+    """
+    Номера элементов всех отрезков [start, end) подряд, без цикла
+    """
+    lengths = ends - starts
+    offsets = starts - np.cumsum(lengths) + lengths
+    return np.repeat(offsets, lengths) + np.arange(lengths.sum())
+
+
+def csr(rows, columns, size, *values):
+    """
+    Пары (строка, столбец), сгруппированные по строкам: указатели
+    начала строк, столбцы и значения в том же порядке
+    """
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return (indptr, columns[order], *(value[order] for value in values))
+
+
+def load_pairs(queryset, *fields):
+    """
+    Значения полей queryset'а массивом (строка на запись)
+    """
+    return np.array(
+        queryset.order_by().values_list(*fields), dtype=np.int64
+    ).reshape(-1, len(fields))
+
+
+def group_starts(groups):
+    """
+    Начало группы для каждого элемента отсортированного массива
+    неотрицательных номеров групп
+    """
+    counts = np.bincount(groups)
+    return np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def top_per_group(groups, values, limit, kind=None):
+    """
+    Номера не более limit наибольших values в каждой группе groups
+    (groups отсортированы, values неотрицательны)
+    """
+    order = np.argsort(groups - values / (2 * values.max(initial=1.0)),
+                       kind=kind)
+    ranks = np.arange(len(order)) - group_starts(groups[order])
+    return order[ranks < limit]
+
+
+def blocks(work, block_size):
+    """
+    Номера строк блоками, в каждом примерно block_size единиц работы
+    (но хотя бы одна строка)
+    """
+    total = np.append(0, np.cumsum(work))
+    start = 0
+    while start < len(work):
+        end = np.searchsorted(total, total[start] + block_size, 'right') - 1
+        end = max(end, start + 1)
+        yield np.arange(start, end)
+        start = end
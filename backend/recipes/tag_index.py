@@ -0,0 +1,42 @@
+from threading import Lock
+
+from .models import Tag
+from .versions import TAGS, get_version
+
+
+class TagIndex:
+    """
+    Соответствие slug -> id тегов в памяти процесса.
+    Актуальность сверяется с версией тегов в кеше.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._data = None
+
+    def _get_data(self):
+        version = get_version(TAGS)
+        data = self._data
+        if data is None or data['version'] != version:
+            with self._lock:
+                data = self._data
+                if data is None or data['version'] != version:
+                    data = self._data = {
+                        'version': version,
+                        'ids': dict(
+                            Tag.objects.order_by('name').values_list(
+                                'slug', 'id'
+                            )
+                        ),
+                    }
+        return data
+
+    def choices(self):
+        return [(slug, slug) for slug in self._get_data()['ids']]
+
+    def get_ids(self, slugs):
+        ids = self._get_data()['ids']
+        return {ids[slug] for slug in slugs if slug in ids}
+
+
+tag_index = TagIndex()
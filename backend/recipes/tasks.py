@@ -0,0 +1,130 @@
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from jobs.queue import enqueue, task
+
+from .images import get_rendition_fields, prepare_recipe_images
+from .models import IngredientInRecipe, Recipe
+from .recommendations import (get_recommendation_settings,
+                              refresh_user_recommendations)
+from .search import update_search_documents
+from .similarity import update_similar_recipes
+from .versions import RECIPES, bump_version
+
+
+def reset_recipe_image(recipe):
+    """
+    Сброс копий фото до окончания фоновой обработки. Прежние фото
+    и копии удаляются из хранилища после фиксации транзакции.
+    """
+    fields = get_rendition_fields()
+    if recipe.pk is not None:
+        old_files = Recipe.objects.filter(pk=recipe.pk).values_list(
+            'image', *fields
+        ).first() or ()
+        for name in old_files:
+            if name and name != recipe.image.name:
+                transaction.on_commit(
+                    partial(recipe.image.storage.delete, name)
+                )
+    for field in fields:
+        setattr(recipe, field, None)
+    recipe.image_status = (Recipe.IMAGE_PENDING if recipe.image
+                           else Recipe.IMAGE_READY)
+
+
+def schedule_recipe_image(recipe):
+    """
+    Постановка обработки фото в очередь. Ключ включает время сохранения,
+    так как имя файла может повториться после удаления исходника.
+    """
+    if recipe.image_status != Recipe.IMAGE_PENDING:
+        return None
+    return enqueue(
+        process_recipe_image,
+        {'recipe_id': recipe.id, 'image': recipe.image.name},
+        key=f'recipe_image:{recipe.id}:{recipe.updated_at.isoformat()}'
+    )
+
+
+@task(max_attempts=3)
+def process_recipe_image(recipe_id, image):
+    """
+    Перекодирование загруженного фото и построение копий.
+    Если фото уже заменено или обработано, задача ничего не делает.
+    """
+    recipe = Recipe.objects.select_for_update().filter(
+        pk=recipe_id,
+        image=image,
+        image_status=Recipe.IMAGE_PENDING
+    ).first()
+    if recipe is None:
+        return
+    try:
+        with recipe.image.open('rb') as file:
+            images = prepare_recipe_images(file)
+    except ValidationError:
+        recipe.image_status = Recipe.IMAGE_FAILED
+        recipe.save(update_fields=['image_status', 'updated_at'])
+        return
+    for field, value in images.items():
+        setattr(recipe, field, value)
+    recipe.image_status = Recipe.IMAGE_READY
+    recipe.save(update_fields=[*images, 'image_status', 'updated_at'])
+    transaction.on_commit(partial(recipe.image.storage.delete, image))
+
+
+@task()
+def update_ingredient_search(ingredient_id):
+    """
+    Пересчёт поисковых документов рецептов после изменения ингредиента
+    """
+    update_search_documents(
+        IngredientInRecipe.objects.filter(
+            ingredient_id=ingredient_id
+        ).values_list('recipe_id', flat=True)
+    )
+    transaction.on_commit(partial(bump_version, RECIPES))
+
+
+def schedule_similar_recipes(recipe):
+    """
+    Пересчёт похожих рецептов после сохранения; ключ включает время
+    сохранения, чтобы каждое изменение пересчитывалось заново
+    """
+    return enqueue(
+        refresh_similar_recipes,
+        {'recipe_id': recipe.id},
+        key=f'similar_recipes:{recipe.id}:{recipe.updated_at.isoformat()}'
+    )
+
+
+@task()
+def refresh_similar_recipes(recipe_id):
+    """
+    Пересчёт соседей рецепта, если он ещё существует
+    """
+    if Recipe.objects.filter(pk=recipe_id).exists():
+        update_similar_recipes(recipe_id)
+
+
+def schedule_recommendations(user_id):
+    """
+    Пересчёт рекомендаций пользователя через REFRESH_DELAY секунд;
+    изменения за это время обрабатываются одной задачей
+    """
+    delay = get_recommendation_settings()['REFRESH_DELAY']
+    return enqueue(
+        refresh_recommendations,
+        {'user_id': user_id},
+        key=f'recommendations:{user_id}:{int(time.time() // delay)}',
+        delay=timedelta(seconds=delay)
+    )
+
+
+@task()
+def refresh_recommendations(user_id):
+    refresh_user_recommendations(user_id)
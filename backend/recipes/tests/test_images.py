@@ -0,0 +1,137 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from jobs.models import Job
+from jobs.queue import claim_job, run_job
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.tasks import process_recipe_image
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipeImageTest(TestCase):
+    """
+    Фото рецепта перекодируется в WebP с копиями в фоновой задаче,
+    прежние файлы удаляются при замене фото
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author',
+                                              email='author@example.com')
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.salt = Ingredient.objects.create(name='соль',
+                                             measurement_unit='г')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def encode(self, color, size=(1600, 1000)):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, format='PNG')
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+        return f'data:image/png;base64,{encoded}'
+
+    def create_recipe(self, color='orange'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'name': 'soup', 'text': '-', 'cooking_time': 5,
+                'tags': [self.tag.id], 'image': self.encode(color),
+                'ingredients': [{'id': self.salt.id, 'amount': 5}],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def replace_image(self, recipe, color):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/recipes/{recipe.id}/',
+                                         {'image': self.encode(color)},
+                                         format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        recipe.refresh_from_db()
+        return recipe
+
+    def run_jobs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            while (job := claim_job()) is not None:
+                self.assertTrue(run_job(job), job.last_error)
+
+    def files(self, recipe):
+        return [recipe.image.name, recipe.image_detail.name,
+                recipe.image_card.name]
+
+    def test_upload_schedules_processing(self):
+        recipe = self.create_recipe()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_PENDING)
+        self.assertFalse(recipe.image_card)
+        self.assertFalse(recipe.image_detail)
+        job = Job.objects.get(name=process_recipe_image.task_name)
+        self.assertEqual(job.payload, {'recipe_id': recipe.id,
+                                       'image': recipe.image.name})
+        self.assertEqual(
+            job.key,
+            f'recipe_image:{recipe.id}:{recipe.updated_at.isoformat()}'
+        )
+
+    def test_processing_builds_webp_renditions(self):
+        recipe = self.create_recipe()
+        upload = recipe.image.name
+        self.run_jobs()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_READY)
+        self.assertFalse(default_storage.exists(upload))
+        for name, side in zip(self.files(recipe), (1600, 1200, 480)):
+            with default_storage.open(name) as file, Image.open(file) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(max(image.size), side)
+
+    def test_replaced_image_removes_old_files(self):
+        recipe = self.create_recipe()
+        self.run_jobs()
+        recipe.refresh_from_db()
+        old_files = self.files(recipe)
+        recipe = self.replace_image(recipe, 'green')
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_PENDING)
+        for name in old_files:
+            self.assertFalse(default_storage.exists(name), name)
+        self.assertEqual(
+            Job.objects.filter(name=process_recipe_image.task_name).count(), 2
+        )
+        self.run_jobs()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_READY)
+        for name in self.files(recipe):
+            self.assertTrue(default_storage.exists(name), name)
+
+    def test_job_for_replaced_upload_does_nothing(self):
+        recipe = self.create_recipe()
+        upload = recipe.image.name
+        recipe = self.replace_image(recipe, 'green')
+        self.assertFalse(default_storage.exists(upload))
+        with self.captureOnCommitCallbacks(execute=True):
+            process_recipe_image(recipe_id=recipe.id, image=upload)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_PENDING)
+        self.assertTrue(default_storage.exists(recipe.image.name))
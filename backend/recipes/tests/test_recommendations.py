@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.models import FavoriteRecipe, Recipe, UserRecommendations
+from recipes.recommendations import (build_recommendations,
+                                     get_feed_recipe_ids, popular_recipe_ids,
+                                     refresh_user_recommendations, unpack)
+
+User = get_user_model()
+
+
+class RecommendationsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        cls.reader, cls.peer = [
+            User.objects.create_user(username=name,
+                                     email=f'{name}@example.com')
+            for name in ('reader', 'peer')
+        ]
+        cls.shared, cls.orphan = [
+            Recipe.objects.create(author=cls.author, name=name,
+                                  image='recipes/x.jpg', text='-',
+                                  cooking_time=5)
+            for name in ('shared', 'orphan')
+        ]
+        FavoriteRecipe.objects.bulk_create([
+            FavoriteRecipe(user=cls.reader, recipe=cls.shared),
+            FavoriteRecipe(user=cls.peer, recipe=cls.shared),
+            FavoriteRecipe(user=cls.peer, recipe=cls.orphan),
+        ])
+        cls.author.delete()
+
+    def recommended(self, user):
+        return unpack(UserRecommendations.objects.get(
+            user=user
+        ).recipe_ids).tolist()
+
+    def test_build_with_authorless_recipe(self):
+        self.assertIsNone(Recipe.objects.get(pk=self.orphan.pk).author_id)
+        build_recommendations()
+        self.assertEqual(self.recommended(self.reader), [self.orphan.pk])
+
+    def test_refresh_with_authorless_recipe(self):
+        build_recommendations()
+        UserRecommendations.objects.all().delete()
+        refresh_user_recommendations(self.reader.pk)
+        self.assertEqual(self.recommended(self.reader), [self.orphan.pk])
+
+    def test_popular_fallback_skips_own_recipes(self):
+        own = Recipe.objects.create(author=self.peer, name='own',
+                                    image='recipes/x.jpg', text='-',
+                                    cooking_time=5)
+        FavoriteRecipe.objects.create(user=self.reader, recipe=own)
+        self.assertIn(own.pk, popular_recipe_ids(refresh=True))
+        self.assertFalse(UserRecommendations.objects.filter(
+            user=self.peer
+        ).exists())
+        self.assertNotIn(own.pk, get_feed_recipe_ids(self.peer))
+        self.assertIn(own.pk, get_feed_recipe_ids(self.reader))
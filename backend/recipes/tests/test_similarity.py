@@ -0,0 +1,104 @@
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from recipes.similarity import RecipeVectors
+
+TOP_K = 5
+
+
+@override_settings(SIMILAR_RECIPES={
+    'TOP_K': TOP_K,
+    'MAX_DF': 0.3,
+    'MAX_DF_FLOOR': 0,
+    'MAX_CANDIDATES': 10 ** 6,
+    'TAG_WEIGHT': 0.5,
+    'BLOCK_SIZE': 50,
+})
+class RecipeVectorsTest(SimpleTestCase):
+    """
+    Соседи из разреженных векторов совпадают с полным перебором
+    косинусного сходства
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(7)
+        self.recipe_ids = np.arange(1, 81) * 3
+        self.ingredients = np.array([
+            (recipe_id, ingredient_id)
+            for recipe_id in self.recipe_ids.tolist()
+            for ingredient_id in generator.choice(
+                40, generator.integers(2, 8), replace=False
+            ).tolist()
+        ])
+        self.tags = np.array([
+            (recipe_id, tag_id)
+            for recipe_id in self.recipe_ids.tolist()
+            for tag_id in generator.choice(
+                4, generator.integers(0, 3), replace=False
+            ).tolist()
+        ]).reshape(-1, 2)
+        ingredient_ids, counts = np.unique(self.ingredients[:, 1],
+                                           return_counts=True)
+        self.frequency = {
+            'total': len(self.recipe_ids),
+            'counts': dict(zip(ingredient_ids.tolist(), counts.tolist())),
+        }
+
+    def brute_force(self):
+        """
+        Плотные векторы: вес ингредиента log1p(total / count), вес тега
+        TAG_WEIGHT; соседи - рецепты с общим ингредиентом
+        """
+        total = self.frequency['total']
+        max_df = 0.3 * total
+        size = len(self.recipe_ids)
+        rows = np.searchsorted(self.recipe_ids, self.ingredients[:, 0])
+        counts = np.array([self.frequency['counts'][ingredient_id]
+                           for ingredient_id in self.ingredients[:, 1]])
+        kept = counts <= max_df
+        features = np.zeros((size, 40))
+        features[rows[kept], self.ingredients[kept, 1]] = np.log1p(
+            total / counts[kept]
+        )
+        tags = np.zeros((size, 4))
+        tags[np.searchsorted(self.recipe_ids, self.tags[:, 0]),
+             self.tags[:, 1]] = 0.5
+        vectors = np.hstack([features, tags])
+        norms = np.linalg.norm(vectors, axis=1)
+        scores = vectors @ vectors.T / np.outer(norms, norms)
+        shared = (features > 0).astype(int) @ (features > 0).T.astype(int)
+        expected = {}
+        for row in range(size):
+            candidates = [
+                (-round(scores[row, other], 9), self.recipe_ids[other])
+                for other in range(size)
+                if other != row and shared[row, other]
+            ]
+            expected[self.recipe_ids[row]] = [
+                (recipe_id, -score)
+                for score, recipe_id in sorted(candidates)[:TOP_K]
+            ]
+        return expected
+
+    def test_top_k_matches_brute_force(self):
+        vectors = RecipeVectors(self.recipe_ids, self.ingredients,
+                                self.tags, self.frequency)
+        found = {recipe_id: [] for recipe_id in self.recipe_ids.tolist()}
+        blocks = list(vectors.blocks(50))
+        self.assertGreater(len(blocks), 1)
+        for positions in blocks:
+            queries, candidates, scores = vectors.neighbors(positions, TOP_K)
+            for query, candidate, score in zip(queries, candidates, scores):
+                found[vectors.recipe_ids[positions[query]]].append(
+                    (vectors.recipe_ids[candidate], round(score, 9))
+                )
+        expected = self.brute_force()
+        for recipe_id, neighbors in expected.items():
+            self.assertEqual(
+                [pair[0] for pair in found[recipe_id]],
+                [pair[0] for pair in neighbors],
+                recipe_id
+            )
+            np.testing.assert_allclose(
+                [pair[1] for pair in found[recipe_id]],
+                [pair[1] for pair in neighbors]
+            )
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from recipes.versions import RECIPES, get_version
+
+User = get_user_model()
+
+
+class AuthorVersionTest(TestCase):
+    """
+    Версия рецептов меняется только при изменениях автора,
+    которые видны в рецептах
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author',
+                                             email='author@example.com')
+
+    def assert_bumped(self, expected, change):
+        version = get_version(RECIPES)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertEqual(get_version(RECIPES) != version, expected)
+
+    def test_signup_and_login(self):
+        self.assert_bumped(False, lambda: User.objects.create_user(
+            username='reader', email='reader@example.com'
+        ))
+        self.user.last_login = timezone.now()
+        self.assert_bumped(False, lambda: self.user.save(
+            update_fields=['last_login']
+        ))
+
+    def test_password_change(self):
+        self.user.set_password('new-password-123')
+        self.assert_bumped(False, self.user.save)
+
+    def test_rendered_field_change(self):
+        self.user.first_name = 'Иван'
+        self.assert_bumped(True, self.user.save)
+        self.user.last_name = 'Иванов'
+        self.assert_bumped(True, lambda: self.user.save(
+            update_fields=['last_name']
+        ))
+
+    def test_delete(self):
+        self.assert_bumped(True, self.user.delete)
@@ -0,0 +1,36 @@
+import time
+
+from foodgram.caches import increment, state_cache
+
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+TAGS = 'tags'
+
+
+def _key(name):
+    return f'{name}_version'
+
+
+def _initial():
+    return time.time_ns() // 1000
+
+
+def get_version(name):
+    """
+    Текущая версия данных, по которой сверяются кеши и ETag.
+    Начальное значение берётся от времени, чтобы после сброса кеша
+    версии не повторялись.
+    """
+    key = _key(name)
+    version = state_cache.get(key)
+    if version is None:
+        state_cache.add(key, _initial(), timeout=None)
+        version = state_cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """
+    Увеличение версии данных: все кеши со старой версией устаревают
+    """
+    return increment(_key(name), initial=_initial(), target=state_cache)
@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from foodgram.caches import BufferedCounters, state_cache
+from rest_framework.authentication import TokenAuthentication
+
+REVOKED_KEY = 'token_revoked:{}'
+STATS_KEYS = {'hit': 'token_cache_hits', 'miss': 'token_cache_misses'}
+
+
+def get_token_cache_settings():
+    return settings.TOKEN_CACHE
+
+
+class TokenCache:
+    """
+    Ограниченный по размеру и времени жизни LRU-кеш токенов
+    в памяти процесса. Хранит значения полей токена и пользователя.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires_at'] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        options = get_token_cache_settings()
+        entry['expires_at'] = time.monotonic() + options['TIMEOUT']
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > options['MAX_SIZE']:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+token_cache_stats = BufferedCounters(STATS_KEYS)
+
+
+def get_token_cache_stats():
+    return token_cache_stats.get()
+
+
+def reset_token_cache_stats():
+    token_cache_stats.reset()
+
+
+def revoke_token(key):
+    """
+    Отметка об отзыве токена живёт не дольше записей кеша; записи,
+    сохранённые до отметки, во всех процессах считаются устаревшими.
+    """
+    state_cache.set(REVOKED_KEY.format(key), time.time(),
+                    get_token_cache_settings()['TIMEOUT'])
+    token_cache.discard(key)
+
+
+def _snapshot(obj):
+    fields = [field.attname for field in obj._meta.concrete_fields]
+    return fields, [getattr(obj, field) for field in fields]
+
+
+def _restore(model, snapshot):
+    return model.from_db('default', *snapshot)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к БД для недавно проверенных токенов.
+    """
+
+    def _get_cached(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            return None
+        revoked_at = state_cache.get(REVOKED_KEY.format(key))
+        if revoked_at is not None and revoked_at >= entry['cached_at']:
+            token_cache.discard(key)
+            return None
+        token = _restore(self.get_model(), entry['token'])
+        token.user = _restore(token._meta.get_field('user').related_model,
+                              entry['user'])
+        return token.user, token
+
+    def authenticate_credentials(self, key):
+        cached = self._get_cached(key)
+        if cached is not None:
+            token_cache_stats.count('hit')
+            return cached
+        token_cache_stats.count('miss')
+        cached_at = time.time()
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, {
+            'cached_at': cached_at,
+            'token': _snapshot(token),
+            'user': _snapshot(user),
+        })
+        return user, token
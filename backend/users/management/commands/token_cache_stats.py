@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+from users.authentication import get_token_cache_stats, reset_token_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the token authentication cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after printing them'
+        )
+
+    def handle(self, *args, **options):
+        stats = get_token_cache_stats()
+        total = stats['hit'] + stats['miss']
+        hit_rate = stats['hit'] / total * 100 if total else 0
+        self.stdout.write(
+            f'hits={stats["hit"]} misses={stats["miss"]} '
+            f'hit_rate={hit_rate:.1f}%'
+        )
+        if options['reset']:
+            reset_token_cache_stats()
@@ -0,0 +1,28 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import revoke_token
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(instance, **kwargs):
+    transaction.on_commit(partial(revoke_token, instance.key))
+
+
+@receiver(post_save, sender=User)
+def revoke_user_tokens(instance, created=False, update_fields=None,
+                       **kwargs):
+    if created:
+        return
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key',
+                                                               flat=True):
+        transaction.on_commit(partial(revoke_token, key))
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import token_cache
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """
+    Удалённый или заменённый токен перестаёт работать сразу,
+    в том числе у процессов, где он ещё лежит в LRU
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user',
+                                            email='user@example.com',
+                                            password='secret-password')
+
+    def setUp(self):
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+
+    def get(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return client.get('/api/users/me/')
+
+    def delete_token(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            token.delete()
+
+    def test_logout_rejects_cached_token(self):
+        self.assertEqual(self.get(self.token.key).status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+
+    def test_other_process_lru_sees_revocation(self):
+        key = self.token.key
+        self.assertEqual(self.get(key).status_code, 200)
+        stale = dict(token_cache.get(key))
+        self.delete_token(self.token)
+        # запись в LRU другого процесса, который не получал сигнал
+        token_cache.set(key, stale)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(key).status_code, 401)
+        self.assertIsNone(token_cache.get(key))
+
+    def test_rotated_token(self):
+        key = self.token.key
+        self.assertEqual(self.get(key).status_code, 200)
+        self.delete_token(self.token)
+        new_token = Token.objects.create(user=self.user)
+        self.assertEqual(self.get(key).status_code, 401)
+        self.assertEqual(self.get(new_token.key).status_code, 200)
+
+    def test_user_change_drops_cached_user(self):
+        self.assertEqual(self.get(self.token.key).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+
+    @override_settings(TOKEN_CACHE={'MAX_SIZE': 2, 'TIMEOUT': 300})
+    def test_lru_size_limit(self):
+        keys = [self.token.key] + [
+            Token.objects.create(
+                user=User.objects.create_user(username=f'user{number}',
+                                              email=f'user{number}@ex.com')
+            ).key
+            for number in range(2)
+        ]
+        for key in keys:
+            self.assertEqual(self.get(key).status_code, 200)
+        self.assertIsNone(token_cache.get(keys[0]))
+        self.assertIsNotNone(token_cache.get(keys[1]))
+        self.assertIsNotNone(token_cache.get(keys[2]))
+        self.assertEqual(self.get(keys[0]).status_code, 200)
+        self.assertIsNone(token_cache.get(keys[1]))
+
+    @override_settings(TOKEN_CACHE={'MAX_SIZE': 2, 'TIMEOUT': 60})
+    def test_lru_timeout(self):
+        with mock.patch('users.authentication.time.monotonic',
+                        return_value=1000):
+            self.assertEqual(self.get(self.token.key).status_code, 200)
+        with mock.patch('users.authentication.time.monotonic',
+                        return_value=1059):
+            self.assertIsNotNone(token_cache.get(self.token.key))
+        with mock.patch('users.authentication.time.monotonic',
+                        return_value=1061):
+            self.assertIsNone(token_cache.get(self.token.key))